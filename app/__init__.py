@@ -1 +1,11 @@
-from .main import app
\ No newline at end of file
+def __getattr__(name):
+    # Imported on use, so image pool processes importing
+    # `app.core.images` do not build the app
+    if name == "app":
+        from .main import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return ["app"]
@@ -1,7 +1,5 @@
 from datetime import datetime, timedelta, timezone
 from typing import Annotated
-from google.oauth2 import id_token
-from google.auth.transport import requests
 from fastapi import (
     APIRouter,
     HTTPException,
@@ -10,7 +8,6 @@ from fastapi import (
 )
 from sqlalchemy import select
 
-from app.core.config import settings
 from app.core.deps import (
     COOKIE_NAME,
     UserJWTDep
@@ -25,6 +22,7 @@ from app.database import SessionDep
 from app.database.models import User, Seer, Admin
 from ..user.service import create_user
 from .schemas import UserLogin
+from .service import verify_google_id_token
 from . import responses as res
 
 router = APIRouter(prefix="/access", tags=["Access"])
@@ -40,11 +38,7 @@ async def google_signin(
     เข้าสู่ระบบด้วย Google Sign-In
     '''
     try:
-        idinfo = id_token.verify_oauth2_token(
-            credential,
-            requests.Request(),
-            settings.GOOGLE_CLIENT_ID
-        )
+        idinfo = await verify_google_id_token(credential)
     except ValueError as e:
         raise HTTPException(403, detail=str(e))
 
@@ -101,7 +95,7 @@ async def login(user: UserLogin, session: SessionDep, response: Response):
     row = (await session.execute(stmt)).one_or_none()
     await session.commit()
     hashed_password = row.password if row is not None else None
-    if not verify_password(user.password, hashed_password):
+    if not await verify_password(user.password, hashed_password):
         raise HTTPException(status_code=404, detail="User not found.")
     return set_credential_cookie(row.id, row.seer_id, row.admin_id, response)
 
@@ -0,0 +1,96 @@
+import asyncio
+import base64
+import json
+import logging
+import re
+import time
+
+import httpx
+from google.auth import jwt as google_jwt
+
+from app.core.config import settings
+
+logger = logging.getLogger('uvicorn.error')
+
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+MAX_AGE = re.compile(r'max-age=(\d+)')
+# Seconds between forced refetches, unknown key ids can not make
+# every sign-in fetch the certs
+MIN_REFRESH_INTERVAL = 60
+
+_google_certs: dict[str, str] = {}
+_google_certs_expire: float = 0
+_google_certs_fetched: float = float('-inf')
+_google_certs_lock = asyncio.Lock()
+
+
+def _cache_seconds(response: httpx.Response) -> float:
+    '''
+    Freshness left from `Cache-Control: max-age` minus `Age`.
+    '''
+    match = MAX_AGE.search(response.headers.get('cache-control', ''))
+    if match is None:
+        return 0
+    age = response.headers.get('age', '0')
+    return int(match.group(1)) - (int(age) if age.isdigit() else 0)
+
+
+async def get_google_certs(refresh: bool = False) -> dict[str, str]:
+    '''
+    Google's signing certs by key id, fetched again when the cache
+    headers of the last response say so. Concurrent callers share
+    one fetch. If the fetch fails the stale certs are used.
+
+    `refresh` fetches before expiry, at most every `MIN_REFRESH_INTERVAL`.
+    '''
+    global _google_certs, _google_certs_expire, _google_certs_fetched
+
+    def fresh():
+        now = time.monotonic()
+        if refresh:
+            return now - _google_certs_fetched < MIN_REFRESH_INTERVAL
+        return now < _google_certs_expire
+
+    if fresh():
+        return _google_certs
+    async with _google_certs_lock:
+        if fresh():
+            return _google_certs
+        _google_certs_fetched = time.monotonic()
+        try:
+            async with httpx.AsyncClient(timeout=10) as client:
+                response = await client.get(settings.GOOGLE_CERTS_URL)
+                response.raise_for_status()
+            _google_certs = response.json()
+            _google_certs_expire = time.monotonic() + _cache_seconds(response)
+        except (httpx.HTTPError, ValueError) as e:
+            if not _google_certs:
+                raise ValueError(f"Could not fetch Google certs. {e}")
+            logger.warning(f"Using stale Google certs: {e!r}")
+    return _google_certs
+
+
+def _key_id(token: str) -> str | None:
+    try:
+        header = token.split('.', 1)[0]
+        header = base64.urlsafe_b64decode(header + '=' * (-len(header) % 4))
+        return json.loads(header).get('kid')
+    except (ValueError, AttributeError):
+        return None
+
+
+async def verify_google_id_token(credential: str) -> dict:
+    '''
+    Same checks as `id_token.verify_oauth2_token` without blocking
+    the event loop. Raises ValueError if the token is not valid.
+    '''
+    certs = await get_google_certs()
+    if _key_id(credential) not in certs:
+        # Google rotated its keys before our cached copy expired
+        certs = await get_google_certs(refresh=True)
+    idinfo = google_jwt.decode(
+        credential, certs=certs, audience=settings.GOOGLE_CLIENT_ID
+    )
+    if idinfo.get('iss') not in GOOGLE_ISSUERS:
+        raise ValueError("Wrong issuer.")
+    return idinfo
@@ -1,8 +1,10 @@
 from datetime import datetime, timedelta, timezone
 from sqlalchemy import asc, case, desc, func, insert, select, text, update
-from sqlalchemy.exc import NoResultFound
+from psycopg.errors import ExclusionViolation
+from sqlalchemy.exc import IntegrityError, NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import invalidate, seer_tag
 from app.core.deps import SortingOrder
 from app.core.error import BadRequestException, NotFoundException
 from app.database.models import (
@@ -20,7 +22,7 @@ from ..transaction.service import (
     complete_activity_transactions,
 )
 from .schemas import *
-from .time_slots import get_free_time_slots
+from .time_slots import is_slot_available
 
 CANCEL_QUOTA = 3
 
@@ -128,13 +130,7 @@ async def create_appointment(
         end_time = end_time.astimezone(BKK)
 
     if package_id is not None:
-        slots = await get_free_time_slots(
-            session,
-            seer_id, package_id,
-            start_time.date(), end_time.date(),
-            duration
-        )
-        if (start_time, end_time) not in slots:
+        if not await is_slot_available(session, seer_id, start_time, end_time):
             raise BadRequestException("Time slot not available.")
 
     stmt = insert(Activity).values(type="appointment").returning(Activity.id)
@@ -150,7 +146,14 @@ async def create_appointment(
         questions=questions,
         confirmation_code=confirmation_code,
     )
-    await session.execute(stmt)
+    try:
+        # `seerBusy` row is inserted by trigger
+        await session.execute(stmt)
+    except IntegrityError as e:
+        if isinstance(e.orig, ExclusionViolation):
+            raise BadRequestException("Time slot not available.")
+        raise
+    await invalidate(session, seer_tag(seer_id))
     if commit:
         await session.commit()
     return activity_id
@@ -250,6 +253,7 @@ async def cancel_appointment(
         user_id, seer_id = (await session.execute(stmt)).one()
     except NoResultFound:
         raise NotFoundException("Pending appointment not found.")
+    await invalidate(session, seer_tag(seer_id))
     
     if refund:
         user_coins = await cancel_activity_transactions(
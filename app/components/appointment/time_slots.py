@@ -1,20 +1,24 @@
-from datetime import date, datetime, time, timedelta
+from bisect import bisect_right
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import select
+from sqlalchemy import exists, func, select
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.components.appointment.schemas import AppointmentPublic
 from app.components.seer.schemas import SeerSchedule
 from app.components.seer.service import get_day_offs, get_schedules
+from app.core.cache import TaggedCache, seer_tag
+from app.core.config import settings
 from app.core.error import NotFoundException
+from app.database.connection import async_session
 from app.database.models import (
     ApmtStatus,
     Appointment,
-    AuctionInfo,
     FPStatus,
     FortunePackage,
     Seer,
+    SeerBusy,
     User,
 )
 
@@ -69,28 +73,46 @@ async def get_busy_time_ranges(
     start_date: date | datetime,
     end_date: date | datetime
 ):
+    '''
+    Appointments that are not cancelled and auction appointment windows
+    of seer overlapping [start_date, end_date), read from `seerBusy`.
+    '''
     stmt = (
         select(
-            AuctionInfo.appoint_start_time.label('start_time'),
-            AuctionInfo.appoint_end_time.label('end_time')
+            func.lower(SeerBusy.span).label('start_time'),
+            func.upper(SeerBusy.span).label('end_time')
         ).
         where(
-            AuctionInfo.seer_id == seer_id,
-            AuctionInfo.appoint_end_time > start_date,
-            AuctionInfo.appoint_start_time < end_date
+            SeerBusy.seer_id == seer_id,
+            SeerBusy.span.overlaps(func.tstzrange(start_date, end_date))
         )
     )
     return [
-        TimeRange.model_validate(a)
-        for a in (await get_appointments_in_date_range(
-            session, start_date, end_date, seer_id, None, True
-        ))
-    ] + [
         TimeRange.model_validate(r)
         for r in (await session.execute(stmt))
     ]
 
 
+async def is_seer_busy(
+    session: AsyncSession,
+    seer_id: int,
+    start_time: datetime,
+    end_time: datetime,
+    exclude_activity_id: int = None
+) -> bool:
+    '''
+    One probe of the `seerBusy` exclusion index. The constraint still
+    rejects the insert if another transaction takes the time meanwhile.
+    '''
+    busy = exists().where(
+        SeerBusy.seer_id == seer_id,
+        SeerBusy.span.overlaps(func.tstzrange(start_time, end_time))
+    )
+    if exclude_activity_id is not None:
+        busy = busy.where(SeerBusy.activity_id != exclude_activity_id)
+    return (await session.scalars(select(busy))).one()
+
+
 def is_overlapping(
     start1: datetime, end1: datetime,
     start2: datetime, end2: datetime
@@ -104,48 +126,78 @@ def daterange(start_date: date, end_date: date):
         yield start_date + timedelta(n)
 
 
-def non_overlapping_range(
-    start1: datetime, end1: datetime,
-    start2: datetime, end2: datetime
-) -> list[tuple[datetime, datetime]]:
-    non_overlap = []
-    if start1 < start2:
-        non_overlap.append((start1, min(end1, start2)))
-    if end1 > end2:
-        non_overlap.append((max(start1, end2), end1))
-    return non_overlap
-
-
-def remaining_slots(
-    slot: tuple[datetime, datetime],
-    appointments: list[TimeRange]
-) -> list[tuple[datetime, datetime]]:
-    '''
-    รับ time_slot ว่าง 1 ช่องและ list of appointments
-    return list of time_slot ว่างที่เหลือ
-    '''
-    remaining = [slot]
-    for appt in appointments:
-        new_remaining = []
-        for r in remaining:
-            non_overlap = non_overlapping_range(
-                r[0], r[1],
-                appt.start_time, appt.end_time
-            )
-            new_remaining.extend(non_overlap)
-        remaining = new_remaining
-    return remaining
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
 
 
-async def get_free_time_slots(
-    session: AsyncSession,
-    seer_id: int,
-    package_id: int,
-    start_date: date,
-    end_date: date,
-    package_duration: timedelta = None,
-    exclude_past: bool = True,
-):
+def to_epoch(d: datetime) -> int:
+    '''
+    Aware datetime to integer microseconds since epoch.
+    '''
+    return (d - EPOCH) // MICROSECOND
+
+
+def from_epoch(t: int, tz: tzinfo) -> datetime:
+    return (EPOCH + timedelta(microseconds=t)).astimezone(tz)
+
+
+def merge_ranges(ranges: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    '''
+    Sort and merge overlapping or adjacent ranges.
+    '''
+    merged: list[tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def free_ranges(
+    start: int,
+    end: int,
+    busy: list[tuple[int, int]],
+    busy_ends: list[int]
+) -> list[tuple[int, int]]:
+    '''
+    Parts of [start, end) not covered by `busy`, which must be merged
+    by `merge_ranges`. `busy_ends` is the end of each busy range.
+    '''
+    free = []
+    cursor = start
+    i = bisect_right(busy_ends, start)
+    while i < len(busy) and busy[i][0] < end:
+        if busy[i][0] > cursor:
+            free.append((cursor, busy[i][0]))
+        cursor = max(cursor, busy[i][1])
+        i += 1
+    if cursor < end:
+        free.append((cursor, end))
+    return free
+
+
+def slice_range(
+    start: int,
+    end: int,
+    duration: int,
+    step: int,
+    not_before: int = None
+) -> range:
+    '''
+    Start of each `duration` long slot in [start, end),
+    with `step` between slot starts.
+    '''
+    if end - start < duration:
+        return range(0)
+    stop = start + (end - start - duration) // step * step + 1
+    if not_before is not None and not_before > start:
+        start += -(-(not_before - start) // step) * step
+    return range(start, stop, step)
+
+
+async def get_break_duration(session: AsyncSession, seer_id: int) -> timedelta:
     stmt = (
         select(Seer.break_duration).
         join(User, Seer.id == User.id).
@@ -156,15 +208,20 @@ async def get_free_time_slots(
         )
     )
     try:
-        break_duration = (await session.scalars(stmt)).one()
+        return (await session.scalars(stmt)).one()
     except NoResultFound:
         raise NotFoundException("Seer not found.")
 
+
+def merge_schedules(schedules) -> dict[int, list[SeerSchedule]]:
+    '''
+    Group weekly schedules by day, merge overlapping schedules.
+    `schedules` must be ordered by day and start_time.
+    '''
     sch_dict: dict[int, list[SeerSchedule]] = {
         0: [], 1: [], 2: [], 3: [], 4: [], 5: [], 6: []
     }
-    # Get weekly schedules, merge overlapping schedules
-    for sch in await get_schedules(session, seer_id):
+    for sch in schedules:
         last = SeerSchedule.model_validate(sch)
         t_ranges = sch_dict[sch.day]
         if t_ranges and t_ranges[-1].end_seconds >= last.start_seconds:
@@ -173,12 +230,84 @@ async def get_free_time_slots(
             )
         else:
             t_ranges.append(last)
+    return sch_dict
+
 
-    day_offs = await get_day_offs(
+def schedule_range(d: date, sch: SeerSchedule) -> tuple[datetime, datetime]:
+    start_dt = datetime.combine(d, sch.start_time, tzinfo=sch.start_time.tzinfo)
+    end_dt = datetime.combine(d, sch.end_time, tzinfo=sch.end_time.tzinfo)
+    if sch.end_time == time(0, tzinfo=sch.end_time.tzinfo):
+        end_dt += timedelta(days=1)
+    return start_dt, end_dt
+
+
+async def is_slot_available(
+    session: AsyncSession,
+    seer_id: int,
+    start_time: datetime,
+    end_time: datetime,
+) -> bool:
+    '''
+    Whether [start_time, end_time) is one of the slots returned by
+    `get_free_time_slots` for a package of `end_time - start_time`.
+
+    Only reads schedules of that weekday, the day off and busy ranges
+    around the slot, so the cost does not grow with the seer's calendar.
+    `start_time` must be in the schedule time zone.
+    '''
+    break_duration = await get_break_duration(session, seer_id)
+    if start_time < datetime.now(timezone.utc):
+        return False
+
+    d = start_time.date()
+    start, end = to_epoch(start_time), to_epoch(end_time)
+    schedules = merge_schedules(
+        await get_schedules(session, seer_id, d.weekday())
+    )
+    for sch in schedules[d.weekday()]:
+        sch_start, sch_end = map(to_epoch, schedule_range(d, sch))
+        if sch_start <= start < sch_end:
+            break
+    else:
+        return False
+    if end > sch_end:
+        return False
+    if await get_day_offs(session, seer_id, d, d, include_past=True):
+        return False
+
+    busy = await get_busy_time_ranges(
+        session, seer_id, from_epoch(sch_start, timezone.utc), end_time
+    )
+    # Slots are sliced from the start of the free range holding the slot
+    free_start = sch_start
+    for b_start, b_end in merge_ranges([
+        (to_epoch(b.start_time), to_epoch(b.end_time)) for b in busy
+    ]):
+        if b_start < end and b_end > start:
+            return False
+        if b_end <= start:
+            free_start = max(free_start, b_end)
+    step = (end_time - start_time + break_duration) // MICROSECOND
+    return (start - free_start) % step == 0
+
+
+async def get_free_time_slots(
+    session: AsyncSession,
+    seer_id: int,
+    package_id: int,
+    start_date: date,
+    end_date: date,
+    package_duration: timedelta = None,
+    exclude_past: bool = True,
+):
+    break_duration = await get_break_duration(session, seer_id)
+    sch_dict = merge_schedules(await get_schedules(session, seer_id))
+
+    day_offs = set(await get_day_offs(
         session, seer_id,
         start_date, end_date,
         include_past=True
-    )
+    ))
 
     appointments = await get_busy_time_ranges(
         session, seer_id, start_date, end_date + timedelta(days=1)
@@ -199,35 +328,62 @@ async def get_free_time_slots(
     except NoResultFound:
         raise NotFoundException("Fortune package not found.")
 
-    # Weekly schedules to datetime slots
-    slots: list[tuple[datetime, datetime]] = []
+    busy = merge_ranges([
+        (to_epoch(a.start_time), to_epoch(a.end_time))
+        for a in appointments
+    ])
+    busy_ends = [b[1] for b in busy]
+    duration = package_duration // MICROSECOND
+    step = (package_duration + break_duration) // MICROSECOND
+    not_before = to_epoch(datetime.now(timezone.utc)) if exclude_past else None
+
+    available_slots: list[tuple[datetime, datetime]] = []
     for d in daterange(start_date, end_date + timedelta(1)):
         if d in day_offs:
             continue
         for sch in sch_dict[d.weekday()]:
-            start_dt = datetime.combine(
-                d, sch.start_time, tzinfo=sch.start_time.tzinfo
-            )
-            end_dt = datetime.combine(
-                d, sch.end_time, tzinfo=sch.end_time.tzinfo
-            )
-            if sch.end_time == time(0, tzinfo=sch.end_time.tzinfo):
-                end_dt += timedelta(days=1)
-            slots.append((start_dt, end_dt))
+            tz = sch.start_time.tzinfo
+            start_dt, end_dt = schedule_range(d, sch)
+            # Free parts of schedule sliced by package and break duration
+            for start, end in free_ranges(
+                to_epoch(start_dt), to_epoch(end_dt), busy, busy_ends
+            ):
+                for t in slice_range(start, end, duration, step, not_before):
+                    available_slots.append(
+                        (from_epoch(t, tz), from_epoch(t + duration, tz))
+                    )
+    return available_slots
 
-    # Remaining slots after appointments
-    remain: list[tuple[datetime, datetime]] = []
-    for s in slots:
-        remain.extend(remaining_slots(s, appointments))
 
-    # Available slots after sliced by package duration and break duration
-    available_slots: list[tuple[datetime, datetime]] = []
-    for r in remain:
-        slot_start = r[0]
-        while (slot_end := slot_start + package_duration) <= r[1]:
-            available_slots.append((slot_start, slot_end))
-            slot_start = slot_end + break_duration
-
-    if exclude_past:
-        return [a for a in available_slots if a[0] >= datetime.now(a[0].tzinfo)]
-    return available_slots
+availability_cache = TaggedCache(
+    settings.AVAILABILITY_CACHE_SIZE,
+    settings.AVAILABILITY_CACHE_TTL
+)
+
+
+async def get_cached_free_time_slots(
+    seer_id: int,
+    package_id: int,
+    start_date: date,
+    end_date: date,
+):
+    '''
+    `get_free_time_slots` cached until the seer's calendar changes, for browsing.
+    Booking must check with `is_slot_available` instead.
+    '''
+    async def load():
+        async with async_session() as session:
+            return await get_free_time_slots(
+                session,
+                seer_id, package_id,
+                start_date, end_date,
+                exclude_past=False
+            )
+
+    slots = await availability_cache.get_or_load(
+        (seer_id, package_id, start_date, end_date),
+        (seer_tag(seer_id),),
+        load
+    )
+    now = datetime.now(timezone.utc)
+    return [s for s in slots if s[0] >= now]
@@ -1,14 +1,17 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Response
 from fastapi.responses import StreamingResponse
 
 from app.components.appointment.schemas import AppointmentId
+from app.core.cache import AUCTION_TAG, cached
 from app.core.deps import SeerJWTDep, UserJWTDep
+from app.core.pagination import set_next_cursor
 from app.core.schemas import RowCount
-from app.database import SessionDep
+from app.database import ReadSessionDep, SessionDep
 
 from . import responses as res
 from .schemas import *
 from .service import *
+from .stream import streaming_bids
 
 SSE_TYPE = "text/event-stream"
 
@@ -17,9 +20,11 @@ router = APIRouter(prefix="/auction", tags=["Auction"])
 
 @router.get("/search", responses=res.search_auctions)
 async def search_auctions(
-    session: SessionDep,
+    session: ReadSessionDep,
+    response: Response,
     last_id: int = None,
     limit: int = Query(10, ge=1, le=100),
+    cursor: str = None,
     seer_id: int = None,
     seer_display_name: str = None,
     name: str = None,
@@ -35,6 +40,8 @@ async def search_auctions(
         กรอง auction_id < last_id เมื่อ direction เป็น desc
         และ auction_id > last_id เมื่อ direction เป็น asc
     - **limit** (int, optional): จำนวนรายการที่ต้องการ
+    - **cursor** (str, optional): สำหรับการแบ่งหน้าตาม order_by
+        ใช้ค่าจาก header X-Next-Cursor ของหน้าก่อนหน้า ถ้ากำหนดจะไม่ใช้ last_id
     - **seer_id** (int, optional): กรอง auction ที่ seer_id ตรงกับที่กำหนด
     - **seer_display_name** (str, optional): 
         กรองชื่อหมอดูที่สร้าง auction ที่ขึ้นต้นตามที่กำหนด
@@ -43,7 +50,7 @@ async def search_auctions(
     - **order_by** (AuctionOrderBy, optional): ชื่อฟิลด์ที่ใช้เรียงลำดับ
     - **direction** ('asc' | 'desc', optional): ทิศทางการเรียงลำดับ
     '''
-    return await get_auctions(
+    page = await get_auctions(
         session,
         seer_id,
         seer_display_name,
@@ -52,16 +59,21 @@ async def search_auctions(
         order_by,
         direction,
         last_id,
-        limit
+        limit,
+        cursor
     )
+    set_next_cursor(response, page)
+    return page
 
 
 @router.get("/seer/me", responses=res.get_seer_auctions)
 async def get_seer_auctions(
     session: SessionDep,
+    response: Response,
     payload: SeerJWTDep,
     last_id: int = None,
     limit: int = Query(10, ge=1, le=100),
+    cursor: str = None,
     name: str = None,
     exclude_ended: bool = False,
     order_by: AuctionOrderBy = AuctionOrderBy.id,
@@ -76,12 +88,14 @@ async def get_seer_auctions(
         กรอง auction_id < last_id เมื่อ direction เป็น desc
         และ auction_id > last_id เมื่อ direction เป็น asc
     - **limit** (int, optional): จำนวนรายการที่ต้องการ
+    - **cursor** (str, optional): สำหรับการแบ่งหน้าตาม order_by
+        ใช้ค่าจาก header X-Next-Cursor ของหน้าก่อนหน้า ถ้ากำหนดจะไม่ใช้ last_id
     - **name** (str, optional): กรองชื่อ auction ที่ขึ้นต้นตามที่กำหนด
     - **exclude_ended** (bool, optional): กรอง auction ที่ยังไม่จบ
     - **order_by** (AuctionOrderBy, optional): ชื่อฟิลด์ที่ใช้เรียงลำดับ
     - **direction** ('asc' | 'desc', optional): ทิศทางการเรียงลำดับ
     '''
-    return await get_auctions(
+    page = await get_auctions(
         session=session,
         seer_id=payload.sub,
         name=name,
@@ -89,11 +103,15 @@ async def get_seer_auctions(
         order_by=order_by,
         direction=direction,
         last_id=last_id,
-        limit=limit
+        limit=limit,
+        cursor=cursor
     )
+    set_next_cursor(response, page)
+    return page
 
 
 @router.get("/{auction_id}", responses=res.get_auction)
+@cached(AUCTION_TAG)
 async def get_auction(
     session: SessionDep,
     auction_id: int
@@ -117,7 +135,6 @@ async def get_auction_bids(
 
 @router.get("/{auction_id}/bids/stream")
 async def streaming_auction_bids(
-    session: SessionDep,
     auction_id: int,
     times: int = Query(600, ge=1, le=1200)
 ):
@@ -125,17 +142,18 @@ async def streaming_auction_bids(
     [Public] ดูรายการเสนอราคาในประมูล top 10 (Server Sent Events)
     มี content-type คือ text/event-stream
 
-    backend จะอัพเดทข้อมูลทุกๆ 1 วินาที ถ้ามีการเปลี่ยนแปลงจะส่งข้อมูลใหม่
-    แต่ถ้าไม่มีการเปลี่ยนแปลงจะไม่ส่งอะไรกลับไป
+    backend จะส่งข้อมูลปัจจุบันทันทีที่เชื่อมต่อ
+    หลังจากนั้นจะส่งข้อมูลใหม่ทุกครั้งที่มีการเสนอราคา
+    ถ้าไม่มีการเปลี่ยนแปลงจะไม่ส่งอะไรกลับไป
 
-    `times` คือกำหนดว่าจะให้ระบบอัพเดทข้อมูลกี่ครั้ง
-    โดยค่าเริ่มต้นคือ 600 ครั้งหรือประมาณ 10 นาที
+    `times` คือจำนวนวินาทีที่จะเปิดการเชื่อมต่อไว้
+    โดยค่าเริ่มต้นคือ 600 วินาทีหรือประมาณ 10 นาที
     ใช้ค่าน้อยๆ สำหรับการทดสอบ
 
     [ข้อมูลอ้างอิง](https://medium.com/@nandagopal05/server-sent-events-with-python-fastapi-f1960e0c8e4b)
     '''
     return StreamingResponse(
-        streaming_bids(session, auction_id, times),
+        streaming_bids(auction_id, times),
         media_type=SSE_TYPE
     )
 
@@ -0,0 +1,186 @@
+import asyncio
+import heapq
+import logging
+import time
+from datetime import timedelta
+
+import psycopg
+from sqlalchemy import exists, func, select
+
+from app.core.config import settings
+from app.core.error import NotFoundException
+from app.database.connection import async_session
+from app.database.listener import conninfo, pg_listener
+from app.database.models import AuctionInfo, Transaction, TxnStatus, TxnType
+from .service import SCHEDULE_CHANNEL, conclude_auction
+
+logger = logging.getLogger('uvicorn.error')
+
+# Key of session-level advisory lock held by the leader worker
+LOCK_KEY = 0x61756374
+
+
+class AuctionScheduler:
+    '''
+    Conclude auctions at their `end_time` inside the app, replacing the
+    trigger service callback when `AUCTION_SCHEDULER` is on.
+
+    Every worker runs one, but only the worker holding the advisory lock
+    `LOCK_KEY` on its own connection concludes auctions. The leader keeps
+    a heap of auctions ending within `AUCTION_SCHEDULER_HORIZON` seconds,
+    reloaded every `AUCTION_SCHEDULER_REFRESH` seconds and updated from
+    `SCHEDULE_CHANNEL` notifications sent by `set_conclude_trigger`.
+    When the leader dies its lock is released and another worker takes over,
+    and auctions that ended meanwhile are concluded on its first load.
+    '''
+
+    def __init__(self):
+        self._heap: list[tuple[float, int]] = []
+        self._scheduled: dict[int, float] = {}
+        self._running: dict[int, asyncio.Task] = {}
+        self._wake = asyncio.Event()
+        self._reload = True
+        self._leader = False
+        self._task: asyncio.Task | None = None
+        self._limit: asyncio.Semaphore | None = None
+
+    async def start(self):
+        if settings.AUCTION_SCHEDULER and self._task is None:
+            self._limit = asyncio.Semaphore(settings.AUCTION_SCHEDULER_CONCURRENCY)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def notify(self, payload: str):
+        '''
+        `SCHEDULE_CHANNEL` payload is "<auction_id> <end_time timestamp>".
+        '''
+        if not self._leader:
+            return
+        try:
+            auction_id, end_time = payload.split()
+            self.schedule(int(auction_id), float(end_time))
+        except ValueError:
+            return
+
+    def reload(self):
+        self._reload = True
+        self._wake.set()
+
+    def schedule(self, auction_id: int, end_time: float):
+        if end_time > time.time() + settings.AUCTION_SCHEDULER_HORIZON:
+            self._scheduled.pop(auction_id, None)
+            return
+        if self._scheduled.get(auction_id) == end_time:
+            return
+        self._scheduled[auction_id] = end_time
+        heapq.heappush(self._heap, (end_time, auction_id))
+        self._wake.set()
+
+    async def _run(self):
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(
+                    conninfo(), autocommit=True
+                ) as conn:
+                    while not await try_lock(conn):
+                        await asyncio.sleep(settings.AUCTION_SCHEDULER_REFRESH)
+                    logger.info("Auction scheduler is leader")
+                    self._leader = True
+                    await self._lead(conn)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Auction scheduler connection lost: {e!r}")
+            finally:
+                self._leader = False
+                self._heap.clear()
+                self._scheduled.clear()
+                for task in self._running.values():
+                    task.cancel()
+            await asyncio.sleep(settings.AUCTION_SCHEDULER_REFRESH)
+
+    async def _lead(self, conn: psycopg.AsyncConnection):
+        next_load = 0.0
+        while True:
+            now = time.time()
+            if self._reload or now >= next_load:
+                self._reload = False
+                # Lock is gone with the connection, stop leading if it broke
+                await conn.execute("SELECT 1")
+                await self._load()
+                next_load = now + settings.AUCTION_SCHEDULER_REFRESH
+
+            while self._heap and self._heap[0][0] <= now:
+                end_time, auction_id = heapq.heappop(self._heap)
+                if self._scheduled.get(auction_id) != end_time:
+                    continue
+                del self._scheduled[auction_id]
+                if auction_id not in self._running:
+                    self._running[auction_id] = asyncio.create_task(
+                        self._conclude(auction_id)
+                    )
+
+            timeout = next_load - now
+            if self._heap:
+                timeout = min(timeout, self._heap[0][0] - now)
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(timeout, 0))
+            except TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def _load(self):
+        '''
+        Schedule auctions ending within horizon that still hold bids,
+        including ended ones that were never concluded.
+        '''
+        horizon = timedelta(seconds=settings.AUCTION_SCHEDULER_HORIZON)
+        stmt = (
+            select(AuctionInfo.id, AuctionInfo.end_time).
+            where(
+                AuctionInfo.end_time <= func.now() + horizon,
+                exists().where(
+                    Transaction.activity_id == AuctionInfo.id,
+                    Transaction.type == TxnType.auction_bid,
+                    Transaction.status == TxnStatus.hold
+                )
+            )
+        )
+        async with async_session() as session:
+            rows = (await session.execute(stmt)).all()
+        for row in rows:
+            self.schedule(row.id, row.end_time.timestamp())
+
+    async def _conclude(self, auction_id: int):
+        try:
+            async with self._limit:
+                async with async_session() as session:
+                    await conclude_auction(session, auction_id, commit=True)
+        except NotFoundException:
+            # end_time was moved after it was scheduled
+            pass
+        except Exception:
+            logger.exception(f"Failed to conclude auction (auction_id = {auction_id})")
+        finally:
+            del self._running[auction_id]
+
+
+async def try_lock(conn: psycopg.AsyncConnection) -> bool:
+    cur = await conn.execute("SELECT pg_try_advisory_lock(%s)", (LOCK_KEY,))
+    (locked,) = await cur.fetchone()
+    return locked
+
+
+auction_scheduler = AuctionScheduler()
+if settings.AUCTION_SCHEDULER:
+    pg_listener.listen(SCHEDULE_CHANNEL, auction_scheduler.notify)
+    pg_listener.on_reconnect(auction_scheduler.reload)
@@ -1,30 +1,29 @@
-import asyncio
 from datetime import datetime
-import json
 from enum import Enum
 import random
 from string import ascii_uppercase, digits
-from sqlalchemy import asc, delete, desc, func, select, update
+from sqlalchemy import cast, delete, desc, func, literal, select, update
 from sqlalchemy.dialects.postgresql import insert
-from sqlalchemy.exc import NoResultFound
+from psycopg.errors import ExclusionViolation
+from sqlalchemy.exc import IntegrityError, NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.components.appointment.service import create_appointment
+from app.core.cache import auction_tag, invalidate, seer_tag
 from app.core.config import settings
 from app.core.deps import SortingOrder, NullLiteral
+from app.core.pagination import make_page, paginate
 from app.core.error import (
     BadRequestException,
     NotFoundException,
-    InternalException,
 )
-from app.components.appointment.time_slots import get_busy_time_ranges
+from app.components.appointment.time_slots import is_seer_busy
 from app.components.transaction.service import (
-    change_user_coins,
-    cancel_bid_transactions,
     complete_bid_transactions,
 )
 from app.database.models import (
     Activity,
+    SeerBusy,
     Transaction,
     TxnStatus,
     TxnType,
@@ -32,9 +31,12 @@ from app.database.models import (
     AuctionInfo,
     BidInfo
 )
-from app.trigger.service import trigger_auction
+from app.trigger.outbox import queue_trigger_auction
 from .schemas import *
 
+BID_CHANNEL = "auction_bids"
+SCHEDULE_CHANNEL = "auction_schedule"
+
 
 class AuctionOrderBy(str, Enum):
     id = 'id'
@@ -54,8 +56,8 @@ async def get_auctions(
     direction: SortingOrder = 'desc',
     last_id: int = None,
     limit: int = 10,
+    cursor: str = None,
 ):
-    order = asc if direction == 'asc' else desc
     row_ordering = {
         AuctionOrderBy.id: AuctionInfo.id,
         AuctionOrderBy.date_created: AuctionInfo.date_created,
@@ -63,13 +65,18 @@ async def get_auctions(
         AuctionOrderBy.end_time: AuctionInfo.end_time,
         AuctionOrderBy.appoint_start_time: AuctionInfo.appoint_start_time
     }
-    stmt = (
-        AuctionCard.select().
-        order_by(order(row_ordering[order_by]))
+    # date_created is in activity, keep both keys on its index
+    id_col = Activity.id if order_by == AuctionOrderBy.date_created else AuctionInfo.id
+    stmt = paginate(
+        AuctionCard.select(),
+        row_ordering[order_by],
+        id_col,
+        direction,
+        cursor
     )
     if limit is not None:
         stmt = stmt.limit(limit)
-    if last_id is not None:
+    if last_id is not None and cursor is None:
         if direction == 'asc':
             stmt = stmt.where(AuctionInfo.id > last_id)
         else:
@@ -82,10 +89,8 @@ async def get_auctions(
         stmt = stmt.where(AuctionInfo.name.ilike(f'{name}%'))
     if exclude_ended:
         stmt = stmt.where(AuctionInfo.end_time > func.now())
-    return [
-        AuctionCard.create_from(r)
-        for r in (await session.execute(stmt))
-    ]
+    rows = (await session.execute(stmt)).all()
+    return make_page([AuctionCard.create_from(r) for r in rows], rows, limit)
 
 
 async def get_auction_by_id(
@@ -146,34 +151,21 @@ async def get_auction_bidder(
     ]
 
 
-async def streaming_bids(
-    session: AsyncSession,
-    auction_id: int,
-    times: int = 600
-):
-    last = None
-    for _ in range(times):
-        bids = await get_auction_bidder(session, auction_id)
-        if bids != last:
-            bidders = [b.model_dump(mode='json') for b in bids]
-            yield json.dumps(bidders) + "\n\n"
-            last = bids
-        await asyncio.sleep(1)
-
-
 async def get_highest_bidder(
     session: AsyncSession,
     auction_id: int
 ):
+    auction = AuctionInfo.__table__
     stmt =  (
         select(
-            BidInfo.auction_id,
-            BidInfo.user_id,
-            BidInfo.amount,
+            auction.c.id.label('auction_id'),
+            auction.c.current_high_bidder.label('user_id'),
+            auction.c.current_high_bid.label('amount'),
         ).
-        where(BidInfo.auction_id == auction_id).
-        order_by(desc(BidInfo.amount)).
-        limit(1)
+        where(
+            auction.c.id == auction_id,
+            auction.c.current_high_bidder != None
+        )
     )
     highest_bid = (await session.execute(stmt)).one_or_none()
     if highest_bid is not None:
@@ -182,17 +174,28 @@ async def get_highest_bidder(
 
 
 async def set_conclude_trigger(
+    session: AsyncSession,
     auction_id: int,
     end_time: datetime,
 ):
-    success = await trigger_auction(
+    '''
+    Queue conclude callback in trigger outbox, or tell the in-process
+    scheduler about the new end time when `AUCTION_SCHEDULER` is on.
+    No commit here.
+    '''
+    if settings.AUCTION_SCHEDULER:
+        payload = f"{auction_id} {end_time.timestamp()}"
+        await session.execute(
+            select(func.pg_notify(SCHEDULE_CHANNEL, payload))
+        )
+        return
+    await queue_trigger_auction(
+        session,
         auction_id,
         end_time + dt.timedelta(seconds=1),
         '/api/auction/conclude',
         settings.TRIGGER_SECRET
     )
-    if not success:
-        raise InternalException({"detail": "Trigger service failed."})
 
 
 async def create_auction(
@@ -200,13 +203,12 @@ async def create_auction(
     seer_id: int,
     data: AuctionCreate,
 ):
-    busy = await get_busy_time_ranges(
+    if await is_seer_busy(
         session,
         seer_id,
         data.appoint_start_time,
         data.appoint_end_time
-    )
-    if busy:
+    ):
         raise BadRequestException("Seer is busy at this time.")
 
     stmt = insert(Activity).values(type="auctionInfo").returning(Activity.id)
@@ -228,8 +230,14 @@ async def create_auction(
         ).
         returning(AuctionInfo.id)
     )
-    auction_id = (await session.scalars(stmt)).one()
-    await set_conclude_trigger(auction_id, data.end_time)
+    try:
+        auction_id = (await session.scalars(stmt)).one()
+    except IntegrityError as e:
+        if isinstance(e.orig, ExclusionViolation):
+            raise BadRequestException("Seer is busy at this time.")
+        raise
+    await set_conclude_trigger(session, auction_id, data.end_time)
+    await invalidate(session, seer_tag(seer_id))
     await session.commit()
     return auction_id
 
@@ -255,13 +263,13 @@ async def edit_auction(
     if not auction.is_valid_time():
         raise BadRequestException("Invalid time range.")
     
-    busy = await get_busy_time_ranges(
+    if await is_seer_busy(
         session,
         seer_id,
         auction.appoint_start_time,
-        auction.appoint_end_time
-    )
-    if busy:
+        auction.appoint_end_time,
+        exclude_activity_id=auction_id
+    ):
         raise BadRequestException("Seer is busy at this time.")
 
     data_dict = data.model_dump(exclude_unset=True)
@@ -270,10 +278,15 @@ async def edit_auction(
         where(AuctionInfo.id == auction_id).
         values(data_dict)
     )
-    rowcount = (await session.execute(stmt)).rowcount
-    await session.execute(stmt)
+    try:
+        rowcount = (await session.execute(stmt)).rowcount
+    except IntegrityError as e:
+        if isinstance(e.orig, ExclusionViolation):
+            raise BadRequestException("Seer is busy at this time.")
+        raise
     if auction_old.end_time != auction.end_time:
-        await set_conclude_trigger(auction_id, auction.end_time)
+        await set_conclude_trigger(session, auction_id, auction.end_time)
+    await invalidate(session, seer_tag(seer_id), auction_tag(auction_id))
     await session.commit()
     return rowcount
 
@@ -288,13 +301,18 @@ async def cancel_auction(
         where(
             AuctionInfo.id == auction_id,
             AuctionInfo.start_time > func.now()
-        )
+        ).
+        returning(AuctionInfo.seer_id)
     )
     if seer_id is not None:
         stmt = stmt.where(AuctionInfo.seer_id == seer_id)
-    rowcount = (await session.execute(stmt)).rowcount
+    seer_ids = (await session.scalars(stmt)).all()
+    if seer_ids:
+        await invalidate(
+            session, *map(seer_tag, set(seer_ids)), auction_tag(auction_id)
+        )
     await session.commit()
-    return rowcount
+    return len(seer_ids)
 
 
 async def conclude_auction(
@@ -316,7 +334,9 @@ async def conclude_auction(
             where(
                 AuctionInfo.id == auction_id,
                 AuctionInfo.end_time <= func.now()
-            )
+            ).
+            # Wait for bids in progress, serializes with `bidding_auction`
+            with_for_update(of=AuctionInfo.__table__)
         )
         try:
             row = (await session.execute(stmt)).one()
@@ -327,6 +347,8 @@ async def conclude_auction(
         appoint_end_time = row.appoint_end_time
 
     highest_bid = await get_highest_bidder(session, auction_id)
+    if highest_bid is None:
+        return None
 
     stmt = (
         select(Transaction.status).
@@ -341,23 +363,25 @@ async def conclude_auction(
     if hold_status is None:
         return None
 
-    apmt_id = None
-    if highest_bid is not None:
-        # TODO: Set trigger to send notification for appointment
-        code = ''.join(random.choices(ascii_uppercase + digits, k=6))
-        apmt_id = await create_appointment(
-            session,
-            highest_bid.user_id,
-            seer_id,
-            None,
-            appoint_start_time,
-            appoint_end_time,
-            confirmation_code=code, 
-            commit=False
-        )
-        await complete_bid_transactions(
-            session, auction_id, highest_bid.user_id, apmt_id, commit=False
-        )
+    # Winner's appointment takes over the auction's busy time
+    await session.execute(
+        delete(SeerBusy).where(SeerBusy.activity_id == auction_id)
+    )
+    # TODO: Set trigger to send notification for appointment
+    code = ''.join(random.choices(ascii_uppercase + digits, k=6))
+    apmt_id = await create_appointment(
+        session,
+        highest_bid.user_id,
+        seer_id,
+        None,
+        appoint_start_time,
+        appoint_end_time,
+        confirmation_code=code, 
+        commit=False
+    )
+    await complete_bid_transactions(
+        session, auction_id, highest_bid.user_id, apmt_id, commit=False
+    )
     
     if commit:
         await session.commit()
@@ -388,6 +412,7 @@ async def end_auction_early(
         raise NotFoundException('Auction not found.')
     if not row.is_started:
         raise BadRequestException("Auction has not started yet.")
+    await invalidate(session, auction_tag(auction_id))
     
     apmt_id = await conclude_auction(
         session, auction_id,
@@ -406,42 +431,78 @@ async def bidding_auction(
     auction_id: int,
     amount: float
 ):
-    # Check if user has enough coins
+    '''
+    Bids on the same auction are serialized by locking the auction row,
+    the refund of the outbid user, bid upsert, coin hold and update of
+    the highest bid on the auction row are then done in one statement.
+    '''
+    auction = AuctionInfo.__table__
+    stmt = (
+        select(
+            (auction.c.start_time <= func.now()).label("is_started"),
+            (auction.c.end_time <= func.now()).label("is_ended"),
+            auction.c.initial_bid,
+            auction.c.min_increment,
+            auction.c.current_high_bidder.label("highest_user_id"),
+            auction.c.current_high_bid.label("highest_amount"),
+            select(User.coins).
+            where(User.id == user_id, User.is_active == True).
+            scalar_subquery().label("coins")
+        ).
+        where(auction.c.id == auction_id).
+        with_for_update(of=auction)
+    )
     try:
-        is_enough = (await session.scalars(
-            select(User.coins >= amount).
-            where(User.id == user_id)
-        )).one()
+        row = (await session.execute(stmt)).one()
     except NoResultFound:
+        raise NotFoundException('Auction not found.')
+
+    if row.coins is None:
         raise NotFoundException("User not found.")
-    if not is_enough:
+    if row.coins < amount:
         raise BadRequestException("Insufficient coins.")
-
-    # Check if auction is ongoing
-    auction, is_started, is_ended = await get_auction_by_id_with_status(
-        session, auction_id
-    )
-    if not is_started:
+    if not row.is_started:
         raise BadRequestException("Auction has not started yet.")
-    if is_ended:
+    if row.is_ended:
         raise BadRequestException("Auction has already ended.")
-    
-    highest_bid = await get_highest_bidder(session, auction_id)
 
     # Check if user bid is valid
-    if highest_bid is not None:
-        if amount < highest_bid.amount + auction.min_increment:
+    if row.highest_amount is not None:
+        if amount < row.highest_amount + row.min_increment:
             raise BadRequestException("Amount is too low.")
-        if highest_bid.user_id == user_id:
+        if row.highest_user_id == user_id:
             raise BadRequestException("Already the highest bidder.")
-        await cancel_bid_transactions(
-            session, auction_id, highest_bid.user_id, commit=False
-        )
-    elif amount < auction.initial_bid:
+    elif amount < row.initial_bid:
         raise BadRequestException("Amount is too low.")
 
+    # Refund the outbid user, unless the account was deleted
+    ctes = []
+    if row.highest_user_id is not None:
+        cancelled = (
+            update(Transaction).
+            where(
+                Transaction.user_id == row.highest_user_id,
+                Transaction.activity_id == auction_id,
+                Transaction.type == TxnType.auction_bid,
+                Transaction.status == TxnStatus.hold
+            ).
+            values(status=TxnStatus.cancelled).
+            returning(Transaction.amount).
+            cte("cancelled")
+        )
+        refund = (
+            update(User).
+            where(User.id == row.highest_user_id).
+            values(coins=User.coins - select(
+                func.coalesce(func.sum(cancelled.c.amount), 0)
+            ).scalar_subquery()).
+            returning(User.id).
+            cte("refund")
+        )
+        ctes += [cancelled, refund]
+
     # Create or update bid
-    stmt = (
+    bid = (
         insert(BidInfo).
         values(
             user_id=user_id,
@@ -451,16 +512,59 @@ async def bidding_auction(
         on_conflict_do_update(
             constraint=BidInfo.__table__.primary_key,
             set_={'amount': amount}
-        )
+        ).
+        returning(BidInfo.user_id).
+        cte("bid")
     )
-    await session.execute(stmt)
-
-    await change_user_coins(
-        session, user_id, -amount,
-        TxnType.auction_bid,
-        TxnStatus.hold,
-        auction_id,
-        commit=False
+    high_bid = (
+        update(auction).
+        where(auction.c.id == auction_id).
+        values(current_high_bid=amount, current_high_bidder=user_id).
+        returning(auction.c.id).
+        cte("high_bid")
+    )
+    # Hold coins, no row when coins were spent since the check above
+    hold = (
+        update(User).
+        where(
+            User.id == user_id,
+            User.is_active == True,
+            User.coins >= amount
+        ).
+        values(coins=User.coins - amount).
+        returning(User.coins).
+        cte("hold")
     )
+    txn = (
+        insert(Transaction).
+        from_select(
+            ['user_id', 'activity_id', 'amount', 'type', 'status'],
+            select(
+                literal(user_id),
+                literal(auction_id),
+                literal(-amount, Transaction.amount.type),
+                cast(
+                    literal(TxnType.auction_bid, Transaction.type.type),
+                    Transaction.type.type
+                ),
+                cast(
+                    literal(TxnStatus.hold, Transaction.status.type),
+                    Transaction.status.type
+                )
+            ).
+            select_from(hold)
+        ).
+        returning(Transaction.id).
+        cte("txn")
+    )
+    stmt = (
+        select(
+            hold.c.coins,
+            func.pg_notify(BID_CHANNEL, str(auction_id))
+        ).
+        add_cte(*ctes, bid, high_bid, txn)
+    )
+    if (await session.execute(stmt)).one_or_none() is None:
+        raise BadRequestException("Insufficient coins.")
     await session.commit()
     return Bidder(auction_id=auction_id, user_id=user_id, amount=amount)
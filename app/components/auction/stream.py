@@ -0,0 +1,153 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+
+from app.database.connection import async_session
+from app.database.listener import pg_listener
+from .service import BID_CHANNEL, get_auction_bidder
+
+logger = logging.getLogger('uvicorn.error')
+
+
+class BidHub:
+    '''
+    In-process fan-out of auction top 10 bidders.
+
+    `bidding_auction` sends `NOTIFY` on `BID_CHANNEL` when a bid commits.
+    Each worker then reads the top 10 once per auction and pushes the same
+    serialized payload to every subscriber of that auction in the worker.
+    '''
+
+    def __init__(self):
+        self._subscribers: dict[int, set[asyncio.Queue[str]]] = defaultdict(set)
+        self._payloads: dict[int, str] = {}
+        self._loading: dict[int, asyncio.Task[str]] = {}
+        self._refreshing: dict[int, asyncio.Task] = {}
+        self._dirty: set[int] = set()
+
+    def subscribe(self, auction_id: int) -> asyncio.Queue[str]:
+        queue = asyncio.Queue(maxsize=1)
+        self._subscribers[auction_id].add(queue)
+        return queue
+
+    def unsubscribe(self, auction_id: int, queue: asyncio.Queue[str]):
+        subscribers = self._subscribers.get(auction_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[auction_id]
+            self._payloads.pop(auction_id, None)
+
+    async def snapshot(self, auction_id: int) -> str:
+        '''
+        Current payload of auction. Only read from database
+        when no other subscriber in this worker has it yet.
+        '''
+        payload = self._payloads.get(auction_id)
+        if payload is not None:
+            return payload
+        loading = self._loading.get(auction_id)
+        if loading is None:
+            loading = asyncio.create_task(self._load(auction_id))
+            self._loading[auction_id] = loading
+        return await asyncio.shield(loading)
+
+    async def _load(self, auction_id: int) -> str:
+        try:
+            async with async_session() as session:
+                bids = await get_auction_bidder(session, auction_id)
+            payload = serialize(bids)
+            if auction_id in self._subscribers:
+                self._payloads.setdefault(auction_id, payload)
+            return self._payloads.get(auction_id, payload)
+        finally:
+            del self._loading[auction_id]
+
+    def notify(self, payload: str):
+        try:
+            auction_id = int(payload)
+        except ValueError:
+            return
+        self.refresh(auction_id)
+
+    def refresh_all(self):
+        for auction_id in list(self._subscribers):
+            self.refresh(auction_id)
+
+    def refresh(self, auction_id: int):
+        '''
+        Schedule a read of auction top 10. Notifications arriving while
+        a read is running are coalesced into one more read.
+        '''
+        if auction_id not in self._subscribers:
+            return
+        if auction_id in self._refreshing:
+            self._dirty.add(auction_id)
+            return
+        self._refreshing[auction_id] = asyncio.create_task(
+            self._refresh(auction_id)
+        )
+
+    async def _refresh(self, auction_id: int):
+        try:
+            while auction_id in self._subscribers:
+                self._dirty.discard(auction_id)
+                async with async_session() as session:
+                    bids = await get_auction_bidder(session, auction_id)
+                self._publish(auction_id, serialize(bids))
+                if auction_id not in self._dirty:
+                    break
+        except Exception:
+            logger.exception(f"Failed to refresh bids (auction_id = {auction_id})")
+        finally:
+            del self._refreshing[auction_id]
+
+    def _publish(self, auction_id: int, payload: str):
+        if payload == self._payloads.get(auction_id):
+            return
+        subscribers = self._subscribers.get(auction_id)
+        if not subscribers:
+            return
+        self._payloads[auction_id] = payload
+        for queue in subscribers:
+            # Slow consumers only need the latest top 10
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(payload)
+
+
+def serialize(bids) -> str:
+    bidders = [b.model_dump(mode='json') for b in bids]
+    return json.dumps(bidders) + "\n\n"
+
+
+bid_hub = BidHub()
+pg_listener.listen(BID_CHANNEL, bid_hub.notify)
+pg_listener.on_reconnect(bid_hub.refresh_all)
+
+
+async def streaming_bids(auction_id: int, times: int = 600):
+    '''
+    Stream of top 10 bidders of auction for `times` seconds.
+
+    Does not hold a database session, connections are only borrowed
+    by `bid_hub` while reading the top 10.
+    '''
+    queue = bid_hub.subscribe(auction_id)
+    try:
+        last = await bid_hub.snapshot(auction_id)
+        yield last
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + times
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                payload = await asyncio.wait_for(queue.get(), remaining)
+            except TimeoutError:
+                break
+            if payload != last:
+                yield payload
+                last = payload
+    finally:
+        bid_hub.unsubscribe(auction_id, queue)
@@ -1,6 +1,12 @@
 from fastapi import APIRouter, File, UploadFile
 from sqlalchemy import select, update
 
+from app.core.cache import (
+    FPACKAGE_SEARCH_TAG,
+    auction_tag,
+    invalidate,
+    seer_tag,
+)
 from app.core.deps import UserJWTDep
 from app.core.error import (
     BadRequestException,
@@ -30,6 +36,7 @@ async def upload_user_profile_image(
     '''
     upload รูป profile
     (PNG or JPG) (Size < 10MB)
+    เก็บเป็นรูปย่อ thumb, card และ full
     '''
     user_id = payload.sub
     part = "user"
@@ -37,23 +44,34 @@ async def upload_user_profile_image(
 
     await ValidateFile(file)
 
+    # Row is not locked while the image is processed and uploaded
+    owned = (
+        User.id == user_id,
+        User.is_active == True,
+    )
+    found = await session.scalar(select(User.id).where(*owned))
+    await session.commit()
+    if found is None:
+        raise NotFoundException("User not found.")
+
+    variants = await ProcessImage(file)
+    if not await UploadImage(part, file_name, variants):
+        raise InternalException("Fail To Upload")
+
     local_url = CreateUrl(part, file_name)
     stmt = (
         update(User).
-        where(User.id == user_id, User.is_active == True).
+        where(*owned).
         values(image=local_url).
         returning(User.id)
     )
-
     result = (await session.execute(stmt)).one_or_none()
     if result is None:
         raise NotFoundException("User not found.")
 
-    if not await UploadImage(part, file_name, file):
-        raise InternalException("Fail To Upload")
-
+    await invalidate(session, seer_tag(user_id), FPACKAGE_SEARCH_TAG)
     await session.commit()
-    return {"url": local_url}
+    return {"url": local_url, "variants": VariantUrls(part, file_name)}
 
 
 @router.post("/package/fortune/{package_id}")
@@ -66,6 +84,7 @@ async def upload_fortune_package_image(
     '''
     upload รูป fortune package
     (PNG or JPG) (Size < 10MB)
+    เก็บเป็นรูปย่อ thumb, card และ full
     '''
     user_id = payload.sub
     part = "package/fortune"
@@ -73,25 +92,33 @@ async def upload_fortune_package_image(
 
     await ValidateFile(file)
 
+    owned = (
+        FortunePackage.id == package_id,
+        FortunePackage.seer_id == user_id,
+        FortunePackage.status == FPStatus.draft,
+    )
+    found = await session.scalar(select(FortunePackage.id).where(*owned))
+    await session.commit()
+    if found is None:
+        raise NotFoundException("Fortune Package not found.")
+
+    variants = await ProcessImage(file)
+    if not await UploadImage(part, file_name, variants):
+        raise InternalException('Fail To Upload')
+
     local_url = CreateUrl(part, file_name)
     stmt = (
         update(FortunePackage).
-        where(FortunePackage.id == package_id,
-              FortunePackage.seer_id == user_id,
-              FortunePackage.status == FPStatus.draft).
+        where(*owned).
         values(image=local_url).
         returning(FortunePackage.id)
     )
-
     result = (await session.execute(stmt)).one_or_none()
     if result is None:
         raise NotFoundException("Fortune Package not found.")
 
-    if not await UploadImage(part, file_name, file):
-        raise InternalException('Fail To Upload')
-
     await session.commit()
-    return {"url": local_url}
+    return {"url": local_url, "variants": VariantUrls(part, file_name)}
 
 @router.post("/auction/{auction_id}")
 async def upload_fortune_package_image(
@@ -103,6 +130,7 @@ async def upload_fortune_package_image(
     '''
     upload รูป fortune package
     (PNG or JPG) (Size < 10MB)
+    เก็บเป็นรูปย่อ thumb, card และ full
     '''
     user_id = payload.sub
     part = "auction_id"
@@ -110,25 +138,33 @@ async def upload_fortune_package_image(
 
     await ValidateFile(file)
 
+    owned = (
+        AuctionInfo.id == auction_id,
+        AuctionInfo.seer_id == user_id,
+    )
+    found = await session.scalar(select(AuctionInfo.id).where(*owned))
+    await session.commit()
+    if found is None:
+        raise NotFoundException("Auction not found.")
+
+    variants = await ProcessImage(file)
+    if not await UploadImage(part, file_name, variants):
+        raise InternalException('Fail To Upload')
+
     local_url = CreateUrl(part, file_name)
     stmt = (
         update(AuctionInfo).
-        where(AuctionInfo.id == auction_id,
-              AuctionInfo.seer_id == user_id,
-              ).
+        where(*owned).
         values(image=local_url).
         returning(AuctionInfo.id)
     )
-
     result = (await session.execute(stmt)).one_or_none()
     if result is None:
         raise NotFoundException("Auction not found.")
 
-    if not await UploadImage(part, file_name, file):
-        raise InternalException('Fail To Upload')
-
+    await invalidate(session, auction_tag(auction_id))
     await session.commit()
-    return {"url": local_url}
+    return {"url": local_url, "variants": VariantUrls(part, file_name)}
 
 
 @router.post("/package/question")
@@ -136,6 +172,7 @@ async def upload_question_package_image(payload: UserJWTDep, session: SessionDep
     '''
     upload รูป question package
     (PNG or JPG) (Size < 10MB)
+    เก็บเป็นรูปย่อ thumb, card และ full
     '''
     user_id = payload.sub
     part = "package/question"
@@ -143,20 +180,30 @@ async def upload_question_package_image(payload: UserJWTDep, session: SessionDep
 
     await ValidateFile(file)
 
+    owned = (
+        QuestionPackage.seer_id == user_id,
+        QuestionPackage.id == 1,
+    )
+    found = await session.scalar(select(QuestionPackage.id).where(*owned))
+    await session.commit()
+    if found is None:
+        raise NotFoundException("Package Question not found.")
+
+    variants = await ProcessImage(file)
+    if not await UploadImage(part, file_name, variants):
+        raise InternalException('Fail To Upload')
+
     local_url = CreateUrl(part, file_name)
     stmt = (
         update(QuestionPackage).
-        where(QuestionPackage.seer_id == user_id, QuestionPackage.id == 1).
+        where(*owned).
         values(image=local_url).
         returning(QuestionPackage.id)
     )
-
     result = (await session.execute(stmt)).one_or_none()
     if result is None:
         raise NotFoundException("Package Question not found.")
 
-    if not await UploadImage(part, file_name, file):
-        raise InternalException('Fail To Upload')
-
+    await invalidate(session, seer_tag(user_id))
     await session.commit()
-    return {"url": local_url}
+    return {"url": local_url, "variants": VariantUrls(part, file_name)}
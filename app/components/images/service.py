@@ -1,15 +1,26 @@
-from fastapi import UploadFile
+import asyncio
+import io
+import multiprocessing
 import urllib.parse
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi import UploadFile
+from PIL import Image, UnidentifiedImageError
 
-from app.objectStorage import get_s3_connect, get_s3_main_Bucket
+from app.objectStorage import upload_object, delete_object
 from app.core.config import settings
 from app.core.error import BadRequestException
+from app.core.images import FULL, IMAGE_VARIANTS, check_format, make_variants
 
 custom_url = "https://storage.qseer.app/"
 
 ALLOWED_EXTENSIONS = {"image/png", "image/jpeg"}
 MAX_FILE_SIZE_MB = 10  # MB
 
+IMAGE_CONTENT_TYPES = {"WEBP": "image/webp", "AVIF": "image/avif"}
+
+_image_executor: ProcessPoolExecutor | None = None
+
 
 async def ValidateFile(file: UploadFile):
     if file.content_type not in ALLOWED_EXTENSIONS:
@@ -22,14 +33,91 @@ async def ValidateFile(file: UploadFile):
     return True
 
 
-def CreateUrl(part_name: str, file_name: str):
-    return custom_url + urllib.parse.quote(part_name+"/"+file_name)
+def ObjectKey(part_name: str, file_name: str, variant: str = FULL):
+    '''
+    `full` is stored at the plain key, so stored urls stay the full image
+    and other variants are found by adding `_<variant>` to it.
+    '''
+    key = part_name+"/"+file_name
+    if variant != FULL:
+        key += "_"+variant
+    return key
+
+
+def CreateUrl(part_name: str, file_name: str, variant: str = FULL):
+    return custom_url + urllib.parse.quote(ObjectKey(part_name, file_name, variant))
+
+
+def VariantUrls(part_name: str, file_name: str) -> dict[str, str]:
+    return {
+        variant: CreateUrl(part_name, file_name, variant)
+        for variant in IMAGE_VARIANTS
+    }
+
+
+def get_image_executor():
+    global _image_executor
+    if _image_executor is None:
+        # Not forked from the worker, a fork of a process running other
+        # threads (bcrypt, s3) may copy a lock held by one of them
+        _image_executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("forkserver")
+        )
+    return _image_executor
 
 
-async def UploadImage(part_name: str, file_name: str, file: UploadFile):
+async def start_image_executor():
+    '''
+    Called at startup in `lifespan`, so a pool that can not start or a
+    Pillow without `IMAGE_FORMAT` fails there instead of on first upload.
+    '''
+    loop = asyncio.get_running_loop()
+    if not await loop.run_in_executor(
+        get_image_executor(), check_format, settings.IMAGE_FORMAT
+    ):
+        raise RuntimeError(f"Pillow can not encode {settings.IMAGE_FORMAT}.")
+
+
+def shutdown_image_executor():
+    '''Called at shutdown in `lifespan`.'''
+    global _image_executor
+    if _image_executor is not None:
+        _image_executor.shutdown(cancel_futures=True)
+        _image_executor = None
+
+
+async def ProcessImage(file: UploadFile) -> dict[str, bytes]:
+    '''
+    Encoded variants of an uploaded image, by variant name.
+    '''
+    data = await file.read()
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(
+            get_image_executor(), make_variants, data,
+            settings.IMAGE_FORMAT, settings.IMAGE_QUALITY
+        )
+    except (
+        UnidentifiedImageError,
+        Image.DecompressionBombError,
+        Image.DecompressionBombWarning,
+        OSError
+    ):
+        raise BadRequestException("Invalid image.")
+
+
+async def UploadImage(part_name: str, file_name: str, variants: dict[str, bytes]):
+    content_type = IMAGE_CONTENT_TYPES[settings.IMAGE_FORMAT]
     try:
-        get_s3_connect().upload_fileobj(
-            file.file, get_s3_main_Bucket(), part_name+"/"+file_name)
+        await asyncio.gather(*(
+            upload_object(
+                ObjectKey(part_name, file_name, variant),
+                io.BytesIO(data),
+                content_type
+            )
+            for variant, data in variants.items()
+        ))
     except Exception:
         return False
     return True
@@ -37,10 +125,10 @@ async def UploadImage(part_name: str, file_name: str, file: UploadFile):
 
 async def DeleteImage(part_name: str, file_name: str):
     try:
-        get_s3_connect().delete_object(
-            Bucket=get_s3_main_Bucket(),
-            Key=part_name+"/"+file_name
-        )
+        await asyncio.gather(*(
+            delete_object(ObjectKey(part_name, file_name, variant))
+            for variant in IMAGE_VARIANTS
+        ))
     except Exception:
         return False
     return True
@@ -0,0 +1,24 @@
+import os
+from fastapi import APIRouter
+
+from app.core.deps import AdminJWTDep
+from app.database import pool_stats
+
+from .schemas import *
+
+router = APIRouter(prefix="/monitor", tags=["Monitor"])
+
+
+@router.get("/db-pool")
+async def get_db_pool_stats(payload: AdminJWTDep) -> PoolStats:
+    '''
+    [Admin] ดูการใช้งาน connection pool ของฐานข้อมูล
+
+    แต่ละ worker มี pool ของตัวเอง ค่าที่ได้เป็นของ worker ที่ตอบ request นี้ (`pid`)
+    แยกเป็น **primary** และ **replica** (null ถ้าไม่ได้ตั้ง `PG_REPLICA_HOST`)
+    - **size**: ขนาด pool (`DB_POOL_SIZE`)
+    - **checked_in**: connection ที่ว่างอยู่ใน pool
+    - **checked_out**: connection ที่กำลังถูกใช้งาน
+    - **overflow**: จำนวน connection ที่เกิน size (ติดลบคือยังเปิดไม่ครบ size)
+    '''
+    return PoolStats(pid=os.getpid(), **pool_stats())
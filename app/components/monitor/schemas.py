@@ -0,0 +1,15 @@
+from pydantic import BaseModel, Field
+
+
+class EnginePoolStats(BaseModel):
+    size: int = Field(examples=[5])
+    checked_in: int = Field(examples=[3])
+    checked_out: int = Field(examples=[2])
+    overflow: int = Field(examples=[-3])
+    max_overflow: int = Field(examples=[10])
+
+
+class PoolStats(BaseModel):
+    pid: int = Field(examples=[7])
+    primary: EnginePoolStats
+    replica: EnginePoolStats | None = None
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Response
 
 from app.core.deps import AdminJWTDep, UserJWTDep
 from app.core.error import NotFoundException
+from app.core.pagination import set_next_cursor
 from app.database import SessionDep
 
 from . import responses as res
@@ -14,9 +15,11 @@ router = APIRouter(prefix="/report", tags=["Report"])
 @router.get("", responses=res.get_report_list)
 async def get_report_list(
     session: SessionDep,
+    response: Response,
     payload: AdminJWTDep,
     last_id: int = None,
     limit: int = Query(10, ge=1, le=100),
+    cursor: str = None,
     user_id: int = None,
     review_id: int = None,
     order_by: ReportOrderBy = ReportOrderBy.id,
@@ -31,20 +34,25 @@ async def get_report_list(
         กรอง report_id < last_id เมื่อ direction เป็น desc
         และ report_id > last_id เมื่อ direction เป็น asc
     - **limit** (int, optional): จำนวนรายการที่ต้องการ
+    - **cursor** (str, optional): สำหรับการแบ่งหน้าตาม order_by
+        ใช้ค่าจาก header X-Next-Cursor ของหน้าก่อนหน้า ถ้ากำหนดจะไม่ใช้ last_id
     - **user_id** (int, optional): กรอง report ที่เขียนโดย user
     - **review_id** (int, optional): กรอง report ที่เกี่ยวข้องกับ review
     - **order_by** (ReportOrderBy, optional): วิธีการเรียงลำดับ
     - **direction** ('asc' | 'desc', optional): ทิศทางการเรียงลำดับ
     '''
-    return await get_reports(
+    page = await get_reports(
         session,
         last_id=last_id,
         limit=limit,
         user_id=user_id,
         review_id=review_id,
         order_by=order_by,
-        direction=direction
+        direction=direction,
+        cursor=cursor
     )
+    set_next_cursor(response, page)
+    return page
 
 
 @router.get("/{report_id}", responses=res.get_report_detail)
@@ -1,10 +1,11 @@
 from enum import Enum
 from psycopg.errors import ForeignKeyViolation
-from sqlalchemy import asc, desc, insert
+from sqlalchemy import func, insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.deps import SortingOrder
+from app.core.pagination import make_page, paginate
 from app.core.error import InternalException, NotFoundException
 from app.database.models import Report
 from .schemas import *
@@ -25,19 +26,21 @@ async def get_reports(
     review_id: int = None,
     report_id: int = None,
     order_by: ReportOrderBy = ReportOrderBy.id,
-    direction: SortingOrder = 'desc'
+    direction: SortingOrder = 'desc',
+    cursor: str = None
 ):
-    order = asc if direction == 'asc' else desc
     row_ordering = {
         ReportOrderBy.id: Report.id,
-        ReportOrderBy.user_id: Report.user_id,
+        ReportOrderBy.user_id: func.coalesce(Report.user_id, 0),
         ReportOrderBy.review_id: Report.review_id,
         ReportOrderBy.date_created: Report.date_created,
     }
-    stmt = ReportOut.select().order_by(order(row_ordering[order_by]))
+    stmt = paginate(
+        ReportOut.select(), row_ordering[order_by], Report.id, direction, cursor
+    )
     if limit is not None:
         stmt = stmt.limit(limit)
-    if last_id is not None:
+    if last_id is not None and cursor is None:
         if direction == 'asc':
             stmt = stmt.where(Report.id > last_id)
         else:
@@ -48,8 +51,8 @@ async def get_reports(
         stmt = stmt.where(Report.review_id == review_id)
     if report_id is not None:
         stmt = stmt.where(Report.id == report_id)
-    result = await session.execute(stmt)
-    return [ReportOut.create_from(row) for row in result]
+    rows = (await session.execute(stmt)).all()
+    return make_page([ReportOut.create_from(r) for r in rows], rows, limit)
 
 
 async def create_report(
@@ -68,3 +68,11 @@ remove_review = {
     },
     **POSSIBLE_JWTCOOKIE_RESPONSE
 }
+
+reconcile_ratings = {
+    HTTP_200_OK: {
+        "model": RowCount,
+        "description": "Number of seers whose rating was fixed",
+    },
+    **POSSIBLE_JWTCOOKIE_RESPONSE
+}
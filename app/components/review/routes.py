@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Response
 
+from app.core.cache import SEER_TAG, cached
 from app.core.deps import AdminJWTDep, SeerJWTDep, UserJWTDep
+from app.core.pagination import set_next_cursor
 from app.core.schemas import RowCount
 from app.database import SessionDep
 
@@ -14,9 +16,11 @@ router = APIRouter(prefix="/review", tags=["Review"])
 @router.get("", responses=res.get_review_list)
 async def get_review_list(
     session: SessionDep,
+    response: Response,
     payload: AdminJWTDep,
     last_id: int = None,
     limit: int = Query(10, ge=1, le=100),
+    cursor: str = None,
     seer_id: int = None,
     client_id: int = None,
     min_score: int = None,
@@ -33,6 +37,8 @@ async def get_review_list(
         กรอง review_id < last_id เมื่อ direction เป็น desc
         และ review_id > last_id เมื่อ direction เป็น asc
     - **limit** (int, optional): จำนวนรายการที่ต้องการ
+    - **cursor** (str, optional): สำหรับการแบ่งหน้าตาม order_by
+        ใช้ค่าจาก header X-Next-Cursor ของหน้าก่อนหน้า ถ้ากำหนดจะไม่ใช้ last_id
     - **seer_id** (int, optional): กรอง review ที่ seer_id ตรงกับที่กำหนด
     - **client_id** (int, optional): กรอง review ที่ client_id ตรงกับที่กำหนด
     - **min_score** (int, optional): กรอง review ที่ score มากกว่าหรือเท่ากับที่กำหนด
@@ -40,7 +46,7 @@ async def get_review_list(
     - **order_by** (ReviewOrderBy, optional): วิธีการเรียงลำดับ
     - **direction** ('asc' | 'desc', optional): ทิศทางการเรียงลำดับ
     '''
-    return await get_reviews(
+    page = await get_reviews(
         session=session,
         last_id=last_id,
         limit=limit,
@@ -49,16 +55,21 @@ async def get_review_list(
         min_score=min_score,
         max_score=max_score,
         order_by=order_by,
-        direction=direction
+        direction=direction,
+        cursor=cursor
     )
+    set_next_cursor(response, page)
+    return page
 
 
 @router.get("/me", responses=res.get_review_list)
 async def get_my_reviews(
     session: SessionDep,
+    response: Response,
     payload: UserJWTDep,
     last_id: int = None,
     limit: int = Query(10, ge=1, le=100),
+    cursor: str = None,
     order_by: ReviewOrderBy = ReviewOrderBy.id,
     direction: SortingOrder = 'desc'
 ):
@@ -71,25 +82,32 @@ async def get_my_reviews(
         กรอง review_id < last_id เมื่อ direction เป็น desc
         และ review_id > last_id เมื่อ direction เป็น asc
     - **limit** (int, optional): จำนวนรายการที่ต้องการ
+    - **cursor** (str, optional): สำหรับการแบ่งหน้าตาม order_by
+        ใช้ค่าจาก header X-Next-Cursor ของหน้าก่อนหน้า ถ้ากำหนดจะไม่ใช้ last_id
     - **order_by** (ReviewOrderBy, optional): วิธีการเรียงลำดับ
     - **direction** ('asc' | 'desc', optional): ทิศทางการเรียงลำดับ
     '''
-    return await get_reviews(
+    page = await get_reviews(
         session=session,
         last_id=last_id,
         limit=limit,
         client_id=payload.sub,
         order_by=order_by,
-        direction=direction
+        direction=direction,
+        cursor=cursor
     )
+    set_next_cursor(response, page)
+    return page
 
 
 @router.get("/received", responses=res.get_review_list)
 async def get_received_reviews(
     session: SessionDep,
+    response: Response,
     payload: SeerJWTDep,
     last_id: int = None,
     limit: int = Query(10, ge=1, le=100),
+    cursor: str = None,
     order_by: ReviewOrderBy = ReviewOrderBy.id,
     direction: SortingOrder = 'desc'
 ):
@@ -102,17 +120,22 @@ async def get_received_reviews(
         กรอง review_id < last_id เมื่อ direction เป็น desc
         และ review_id > last_id เมื่อ direction เป็น asc
     - **limit** (int, optional): จำนวนรายการที่ต้องการ
+    - **cursor** (str, optional): สำหรับการแบ่งหน้าตาม order_by
+        ใช้ค่าจาก header X-Next-Cursor ของหน้าก่อนหน้า ถ้ากำหนดจะไม่ใช้ last_id
     - **order_by** (ReviewOrderBy, optional): วิธีการเรียงลำดับ
     - **direction** ('asc' | 'desc', optional): ทิศทางการเรียงลำดับ
     '''
-    return await get_reviews(
+    page = await get_reviews(
         session=session,
         last_id=last_id,
         limit=limit,
         seer_id=payload.sub,
         order_by=order_by,
-        direction=direction
+        direction=direction,
+        cursor=cursor
     )
+    set_next_cursor(response, page)
+    return page
 
 
 @router.get("/{review_id}", responses=res.review_detail)
@@ -134,11 +157,14 @@ async def get_review_detail(
 
 
 @router.get("/seer/{seer_id}", responses=res.get_review_list)
+@cached(SEER_TAG)
 async def get_seer_reviews(
     session: SessionDep,
+    response: Response,
     seer_id: int,
     last_id: int = None,
     limit: int = Query(10, ge=1, le=100),
+    cursor: str = None,
     min_score: int = None,
     max_score: int = None,
     order_by: ReviewOrderBy = ReviewOrderBy.id,
@@ -154,12 +180,14 @@ async def get_seer_reviews(
         กรอง review_id < last_id เมื่อ direction เป็น desc
         และ review_id > last_id เมื่อ direction เป็น asc
     - **limit** (int, optional): จำนวนรายการที่ต้องการ
+    - **cursor** (str, optional): สำหรับการแบ่งหน้าตาม order_by
+        ใช้ค่าจาก header X-Next-Cursor ของหน้าก่อนหน้า ถ้ากำหนดจะไม่ใช้ last_id
     - **min_score** (int, optional): กรอง review ที่ score มากกว่าหรือเท่ากับที่กำหนด
     - **max_score** (int, optional): กรอง review ที่ score น้อยกว่าหรือเท่ากับที่กำหนด
     - **order_by** (ReviewOrderBy, optional): วิธีการเรียงลำดับ
     - **direction** ('asc' | 'desc', optional): ทิศทางการเรียงลำดับ
     '''
-    return await get_reviews(
+    page = await get_reviews(
         session=session,
         last_id=last_id,
         limit=limit,
@@ -167,8 +195,11 @@ async def get_seer_reviews(
         min_score=min_score,
         max_score=max_score,
         order_by=order_by,
-        direction=direction
+        direction=direction,
+        cursor=cursor
     )
+    set_next_cursor(response, page)
+    return page
 
 
 @router.post("", status_code=201, responses=res.review_service)
@@ -211,3 +242,24 @@ async def remove_review(
     '''
     rowcount = await delete_review(session, review_id)
     return RowCount(count=rowcount)
+
+
+@router.post("/reconcile", responses=res.reconcile_ratings)
+async def reconcile_ratings(
+    session: SessionDep,
+    payload: AdminJWTDep,
+    seer_id: int = None
+):
+    '''
+    [Admin] คำนวณคะแนนหมอดูใหม่จากรีวิวทั้งหมด แก้เฉพาะหมอดูที่คะแนนไม่ตรง
+
+    Parameters:
+    ----------
+    - **seer_id** (int, optional): ตรวจเฉพาะหมอดูคนนี้
+
+    Returns:
+    ----------
+    - **count** (int): จำนวนหมอดูที่ถูกแก้ไข
+    '''
+    fixed = await reconcile_seer_ratings(session, seer_id)
+    return RowCount(count=len(fixed))
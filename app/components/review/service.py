@@ -1,11 +1,14 @@
 from enum import Enum
 from psycopg.errors import UniqueViolation
-from sqlalchemy import asc, delete, desc, func, insert, select, update
+from sqlalchemy import case, cast, delete, func, insert, or_, select, update
+from sqlalchemy.dialects.postgresql import REAL
 from sqlalchemy.exc import NoResultFound, IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import aliased
 
+from app.core.cache import FPACKAGE_SEARCH_TAG, invalidate, seer_tag
 from app.core.deps import SortingOrder
+from app.core.pagination import make_page, paginate
 from app.core.error import (
     BadRequestException,
     NotFoundException,
@@ -38,9 +41,9 @@ async def get_reviews(
     min_score: int = None,
     max_score: int = None,
     order_by: ReviewOrderBy = ReviewOrderBy.id,
-    direction: SortingOrder = 'desc'
+    direction: SortingOrder = 'desc',
+    cursor: str = None
 ):
-    order = asc if direction == 'asc' else desc
     row_ordering = {
         ReviewOrderBy.id: Review.id,
         ReviewOrderBy.score: Review.score,
@@ -66,12 +69,14 @@ async def get_reviews(
         join(Appointment, Appointment.id == Review.id).
         join(Appointment.package).
         join(seer_u, Appointment.seer_id == seer_u.id).
-        join(client, Appointment.client_id == client.id).
-        order_by(order(row_ordering[order_by]))
+        join(client, Appointment.client_id == client.id)
+    )
+    stmt = paginate(
+        stmt, row_ordering[order_by], Review.id, direction, cursor
     )
     if limit is not None:
         stmt = stmt.limit(limit)
-    if last_id is not None:
+    if last_id is not None and cursor is None:
         if direction == 'asc':
             stmt = stmt.where(Review.id > last_id)
         else:
@@ -86,63 +91,97 @@ async def get_reviews(
         stmt = stmt.where(Review.score >= min_score)
     if max_score is not None:
         stmt = stmt.where(Review.score <= max_score)
-    result = await session.execute(stmt)
-    return [ReviewOut.create_from(row) for row in result]
+    rows = (await session.execute(stmt)).all()
+    return make_page([ReviewOut.create_from(r) for r in rows], rows, limit)
 
 
-async def update_seer_rating(
-    session: AsyncSession,
-    seer_id: int,
-    *,
-    add: bool = True,
-    commit: bool = False
-):
-    CAL_AT = 10
-    stmt = (
-        select(Seer.rating, Seer.review_count).
-        where(Seer.id == seer_id)
+# Rating is shown from this many reviews
+CAL_AT = 10
+
+
+def change_seer_rating(change, sign: int):
+    '''
+    Update rating of seers of the reviews in `change` (a CTE with `id` and
+    `score` of inserted or deleted reviews), +1 for insert, -1 for delete.
+    O(1) per review, no rescan of the seer's reviews.
+    '''
+    apmt = Appointment.__table__
+    review_count = Seer.review_count + sign
+    rating_sum = Seer.rating_sum + sign * change.c.score
+    return (
+        update(Seer).
+        where(
+            apmt.c.id == change.c.id,
+            Seer.id == apmt.c.seer_id
+        ).
+        values(
+            rating_sum=rating_sum,
+            review_count=review_count,
+            rating=case(
+                (
+                    review_count >= CAL_AT,
+                    cast(rating_sum, REAL) / cast(review_count, REAL)
+                ),
+                else_=None
+            )
+        ).
+        returning(Seer.id)
     )
-    try:
-        rating, review_count = (await session.execute(stmt)).one()._tuple()
-    except NoResultFound:
-        raise NotFoundException("Seer not found.")
 
-    sel_stmt = (
+
+async def reconcile_seer_ratings(
+    session: AsyncSession,
+    seer_id: int = None,
+    *,
+    commit: bool = True
+) -> list[int]:
+    '''
+    Recompute rating sum and count from reviews and fix seers whose stored
+    values drifted. Return ids of fixed seers.
+    '''
+    apmt = Appointment.__table__
+    seer = aliased(Seer)
+    stats = (
         select(
-            func.avg(Review.score).label('rating'),
+            seer.id,
+            func.coalesce(func.sum(Review.score), 0).label('rating_sum'),
             func.count(Review.id).label('review_count')
         ).
-        join(Appointment, Review.id == Appointment.id).
-        where(Appointment.seer_id == seer_id).
-        alias('review_stats')
+        outerjoin(apmt, apmt.c.seer_id == seer.id).
+        outerjoin(Review, Review.id == apmt.c.id).
+        group_by(seer.id)
     )
-
-    if add:
-        if review_count + 1 < CAL_AT and rating is None:
-            rating_change = None
-            count_change = Seer.review_count + 1
-        else:
-            rating_change = sel_stmt.c.rating
-            count_change = sel_stmt.c.review_count
-    else:
-        if review_count - 1 < CAL_AT:
-            rating_change = None
-            count_change = Seer.review_count - 1
-        else:
-            rating_change = sel_stmt.c.rating
-            count_change = sel_stmt.c.review_count
-
+    if seer_id is not None:
+        stats = stats.where(seer.id == seer_id)
+    stats = stats.subquery('stats')
     stmt = (
         update(Seer).
-        where(Seer.id == seer_id).
+        where(
+            Seer.id == stats.c.id,
+            or_(
+                Seer.rating_sum != stats.c.rating_sum,
+                Seer.review_count != stats.c.review_count
+            )
+        ).
         values(
-            rating=rating_change,
-            review_count=count_change
-        )
+            rating_sum=stats.c.rating_sum,
+            review_count=stats.c.review_count,
+            rating=case(
+                (
+                    stats.c.review_count >= CAL_AT,
+                    cast(stats.c.rating_sum, REAL) / cast(stats.c.review_count, REAL)
+                ),
+                else_=None
+            )
+        ).
+        returning(Seer.id)
     )
-    await session.execute(stmt)
+    fixed = (await session.scalars(stmt)).all()
+    if fixed:
+        await invalidate(session, *map(seer_tag, fixed), FPACKAGE_SEARCH_TAG)
     if commit:
         await session.commit()
+    return fixed
 
 
 async def create_review(
@@ -170,22 +209,24 @@ async def create_review(
         if status != ApmtStatus.completed:
             raise BadRequestException("Appointment not ended.")
 
-    stmt = (
+    inserted = (
         insert(Review).
         values(
             id=data.id,
             score=data.score,
             text=data.text,
-        )
+        ).
+        returning(Review.id, Review.score).
+        cte('inserted')
     )
+    stmt = change_seer_rating(inserted, 1).add_cte(inserted)
     try:
-        await session.execute(stmt)
+        seer_ids = (await session.scalars(stmt)).all()
     except IntegrityError as e:
         if isinstance(e.orig, UniqueViolation):
             raise BadRequestException("Already reviewed.")
         raise InternalException(str(e.orig))
-
-    await update_seer_rating(session, seer_id)
+    await invalidate(session, *map(seer_tag, seer_ids), FPACKAGE_SEARCH_TAG)
     await session.commit()
 
 
@@ -193,21 +234,17 @@ async def delete_review(
     session: AsyncSession,
     review_id: int
 ):
-    stmt = (
+    deleted = (
         delete(Review).
-        where(Review.id == review_id)
+        where(Review.id == review_id).
+        returning(Review.id, Review.score).
+        cte('deleted')
     )
-    rowcount = (await session.execute(stmt)).rowcount
+    stmt = change_seer_rating(deleted, -1).add_cte(deleted)
+    seer_ids = (await session.scalars(stmt)).all()
+    rowcount = len(seer_ids)
     if rowcount == 0:
         raise NotFoundException("Review not found.")
-    stmt = (
-        select(Appointment.seer_id).
-        where(Appointment.id == review_id)
-    )
-    try:
-        seer_id = (await session.scalars(stmt)).one()
-    except NoResultFound:
-        raise NotFoundException("Appointment not found.")
-    await update_seer_rating(session, seer_id, add=False)
+    await invalidate(session, *map(seer_tag, seer_ids), FPACKAGE_SEARCH_TAG)
     await session.commit()
     return rowcount
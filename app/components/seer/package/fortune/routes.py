@@ -3,7 +3,8 @@ from fastapi import APIRouter, Query
 from sqlalchemy import select
 from sqlalchemy.exc import NoResultFound
 
-from app.components.appointment.time_slots import get_free_time_slots
+from app.components.appointment.time_slots import get_cached_free_time_slots
+from app.core.cache import FPACKAGE_SEARCH_TAG, cached
 from app.core.deps import SeerJWTDep, SortingOrder
 from app.core.error import (
     BadRequestException,
@@ -23,6 +24,7 @@ router = APIRouter(prefix="/fortune")
 
 
 @router.get("/search", responses=res.search_fp)
+@cached(FPACKAGE_SEARCH_TAG)
 async def search_fortune_packages(
     session: SessionDep,
     last_id: int = 0,
@@ -246,7 +248,6 @@ async def get_seer_fortune_package(
 
 @router_id.get("/{package_id}/time-slots", responses=res.get_time_slots)
 async def get_seer_fortune_package_time_slots(
-    session: SessionDep,
     seer_id: int,
     package_id: int,
     start_date: date = None,
@@ -266,8 +267,7 @@ async def get_seer_fortune_package_time_slots(
     if (end_date - start_date).days + 1 > 90:
         raise BadRequestException("Date range must not exceed 90 days.")
     
-    slots = await get_free_time_slots(
-        session,
+    slots = await get_cached_free_time_slots(
         seer_id, package_id,
         start_date, end_date
     )
@@ -2,6 +2,7 @@ from sqlalchemy import asc, delete, desc, func, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.components.seer.schemas import SeerObjectId
+from app.core.cache import FPACKAGE_SEARCH_TAG, invalidate, seer_tag
 from app.core.deps import SortingOrder
 from app.database.models import FPStatus, FortunePackage, Seer, User
 
@@ -201,6 +202,7 @@ async def change_fpackage_status(
         values(status=status)
     )
     rowcount = (await session.execute(stmt)).rowcount
+    await invalidate(session, seer_tag(seer_id), FPACKAGE_SEARCH_TAG)
     await session.commit()
     return rowcount
 
@@ -218,5 +220,6 @@ async def delete_fpackage(
         )
     )
     rowcount = (await session.execute(stmt)).rowcount
+    await invalidate(session, seer_tag(seer_id), FPACKAGE_SEARCH_TAG)
     await session.commit()
     return rowcount
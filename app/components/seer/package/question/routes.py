@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 from sqlalchemy.exc import NoResultFound
 
+from app.core.cache import SEER_TAG, cached
 from app.core.deps import SeerJWTDep
 from app.core.error import (
     IntegrityException,
@@ -52,6 +53,7 @@ router_id = APIRouter(prefix="/question")
 
 
 @router_id.get("")
+@cached(SEER_TAG)
 async def get_seer_question_package(session: SessionDep, seer_id: int):
     '''
     ดูข้อมูล QuestionPackage seer id
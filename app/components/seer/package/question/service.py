@@ -1,6 +1,7 @@
 from sqlalchemy import delete, func, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import invalidate, seer_tag
 from app.database import SessionDep
 from app.database.models import QuestionPackage
 
@@ -49,6 +50,7 @@ async def edit_questionpackage(session: SessionDep, user_id: int, qp_data: Quest
             )
         )
         result = (await session.execute(stmt)).one_or_none()
+        await invalidate(session, seer_tag(user_id))
         await session.commit()
         if result is None:
             return None
@@ -71,6 +73,7 @@ async def edit_questionpackage(session: SessionDep, user_id: int, qp_data: Quest
             )
         )
         result = (await session.execute(stmt)).one_or_none()
+        await invalidate(session, seer_tag(user_id))
         await session.commit()
         if result is None:
             return None
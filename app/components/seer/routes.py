@@ -1,29 +1,34 @@
 from datetime import timedelta
 from fastapi import (
     APIRouter,
-    BackgroundTasks,
     Request,
     status,
     Query,
 )
-from sqlalchemy import insert, text, update
+from sqlalchemy import text, update
 from sqlalchemy.exc import NoResultFound
 
+from app.core.cache import (
+    FPACKAGE_SEARCH_TAG,
+    SEER_TAG,
+    cached,
+    invalidate,
+    seer_tag,
+)
 from app.core.config import settings
 from app.core.deps import AdminJWTDep, SortingOrder, UserJWTDep, SeerJWTDep
 from app.core.error import (
     BadRequestException,
     NotFoundException,
-    InternalException,
 )
 from app.core.security import (
     create_jwt,
     decode_jwt,
 )
 from app.core.schemas import Message, UserId, RowCount
-from app.database import SessionDep
-from app.database.models import Seer, Schedule
-from app.trigger.service import send_verify_seer_email
+from app.database import ReadSessionDep, SessionDep
+from app.database.models import Seer
+from app.trigger.outbox import queue_verify_seer_email
 
 from ..user.service import get_user_email
 from . import responses as res
@@ -37,7 +42,7 @@ router = APIRouter(prefix="/seer", tags=["Seer"])
 
 @router.get("/search", responses=res.search_seers)
 async def search_seers(
-    session: SessionDep,
+    session: ReadSessionDep,
     last_id: int = None,
     limit: int = Query(10, ge=1, le=100),
     display_name: str = None,
@@ -75,7 +80,6 @@ async def seer_signup(
     payload: UserJWTDep,
     session: SessionDep,
     request: Request,
-    bg_tasks: BackgroundTasks
 ):
     '''
     [User] สมัครเป็นหมอดู
@@ -84,16 +88,18 @@ async def seer_signup(
     - **description**: ไม่บังคับ คำอธิบาย แนะนำตัว
     - **primary_skill**: ไม่บังคับ ศาสตร์ดูดวงหลัก
     '''
-    seer_id = await create_seer(session, seer_reg, payload.sub)
+    # Seer and its verification email are committed together
+    seer_id = await create_seer(session, seer_reg, payload.sub, commit=False)
     token = create_jwt({"seer_confirm": seer_id}, timedelta(days=1))
     if not settings.DEVELOPMENT:
-        bg_tasks.add_task(
-            send_verify_seer_email,
+        await queue_verify_seer_email(
+            session,
             await get_user_email(payload.sub, session),
             request.url_for("seer_confirm", token=token)._url
         )
     else:
         print(token)
+    await session.commit()
     return UserId(id=seer_id)
 
 
@@ -123,12 +129,11 @@ async def resend_seer_signup_email(
         raise BadRequestException("Email sent too soon.") 
     token = create_jwt({"seer_confirm": seer_id}, timedelta(days=1))
     if not settings.DEVELOPMENT:
-        success = await send_verify_seer_email(
+        await queue_verify_seer_email(
+            session,
             await get_user_email(payload.sub, session),
             request.url_for("seer_confirm", token=token)._url
         )
-        if not success:
-            raise InternalException({"detail": "Failed to send email."})
     else:
         print(token)
     await session.commit()
@@ -149,6 +154,8 @@ async def seer_confirm(token: str, session: SessionDep):
         returning(Seer.id)
     )
     seer_id = (await session.scalars(stmt)).one_or_none()
+    if seer_id is not None:
+        await invalidate(session, seer_tag(seer_id), FPACKAGE_SEARCH_TAG)
     await session.commit()
     if seer_id is None:
         raise BadRequestException("Already confirmed.")
@@ -200,45 +207,10 @@ async def edit_seer_schedule(
     - inclusive start_time, exclusive end_time
     - format เวลา คือ "HH:MM:SS" หรือ "HH:MM:SS+07:00"
     '''
-    sch_rows = await get_schedules(session, payload.sub)
-    merged = simplify_schedules(schedules)
-    to_add = []
-    if len(merged) > len(sch_rows):
-        to_add = merged[len(sch_rows):]
-        merged = merged[:len(sch_rows)]
-
-    change, will_del = sch_rows[:len(merged)], sch_rows[len(merged):]
-
-    if will_del:
-        count = await delete_extra_schedules(
-            session,
-            payload.sub,
-            will_del[0].day,
-            will_del[0].start_time
-        )
-        if count != len(will_del):
-            raise InternalException("Bug: delet_count != len(will_del)")
-
-    for sch1, sch2 in zip(merged, change):
-        sch2.start_time = sch1.start_time
-        sch2.end_time = sch1.end_time
-        sch2.day = sch1.day
-
-    session.add_all([
-        Schedule(
-            seer_id=payload.sub,
-            start_time=sch.start_time,
-            end_time=sch.end_time,
-            day=sch.day
-        )
-        for sch in to_add
-    ])
-
-    await session.commit()
-    return [
-        SeerScheduleIn.model_validate(sch)
-        for sch in await get_schedules(session, payload.sub)
-    ]
+    rows = await replace_schedules(
+        session, payload.sub, simplify_schedules(schedules)
+    )
+    return [SeerScheduleIn.model_validate(sch) for sch in rows]
 
 
 @router_me.post("/dayoff", status_code=201, responses=res.seer_dayoff)
@@ -262,6 +234,7 @@ router_id = APIRouter(prefix="/{seer_id}", tags=["Seer Id"])
 
 
 @router_id.get("", responses=res.seer_info)
+@cached(SEER_TAG)
 async def seer_info(seer_id: int, session: SessionDep):
     '''
     [Public] ดูข้อมูลหมอดู
@@ -298,6 +271,7 @@ async def seer_total_followers(seer_id: int, session: SessionDep):
 
 
 @router_id.get("/calendar", responses=res.seer_calendar)
+@cached(SEER_TAG)
 async def seer_calendar(seer_id: int, session: SessionDep):
     '''
     [Public] ดูข้อมูลตารางเวลารายสัปดาห์และวันหยุดของหมอดู
@@ -347,6 +321,7 @@ async def verify_seer(
         seer_id = (await session.scalars(stmt)).one()
     except NoResultFound:
         raise NotFoundException("Seer not found or verified.")
+    await invalidate(session, seer_tag(seer_id))
     await session.commit()
     return UserId(id=seer_id)
 
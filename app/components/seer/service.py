@@ -1,9 +1,22 @@
 from psycopg.errors import UniqueViolation, UndefinedTable
-from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy import (
+    and_,
+    column,
+    delete,
+    exists,
+    func,
+    insert,
+    literal,
+    select,
+    union_all,
+    update,
+    values,
+)
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError, ProgrammingError, OperationalError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import invalidate, seer_tag
 from app.core.deps import SortingOrder
 from app.core.error import IntegrityException, InternalException
 from app.database.models import User, Seer, Schedule, DayOff, FollowSeer
@@ -11,13 +24,20 @@ from app.database.utils import parse_unique_violation
 from .schemas import *
 
 
-async def create_seer(session: AsyncSession, seer_reg: SeerIn, user_id: int) -> int:
+async def create_seer(
+    session: AsyncSession,
+    seer_reg: SeerIn,
+    user_id: int,
+    *,
+    commit: bool = True
+) -> int:
     reg_dict = seer_reg.model_dump(exclude_unset=True)
     reg_dict["id"] = user_id
     try:
         stmt = insert(Seer).values(reg_dict).returning(Seer.id)
         seer_id = (await session.scalars(stmt)).one()
-        await session.commit()
+        if commit:
+            await session.commit()
         return seer_id
     except IntegrityError as e:
         detail = {"type": "IntegrityError", "detail": "Unknown error."}
@@ -74,6 +94,7 @@ async def update_seer(
         values(update_dict)
     )
     rowcount = (await session.execute(stmt)).rowcount
+    await invalidate(session, seer_tag(seer_id))
     await session.commit()
     return rowcount
 
@@ -132,20 +153,18 @@ async def get_seer_followers(
         join_from(FollowSeer, User, FollowSeer.c.user_id == User.id).
         where(
             FollowSeer.c.seer_id == seer_id,
-            User.id > last_id
+            FollowSeer.c.user_id > last_id
         ).
-        order_by(User.id).limit(limit)
+        # Walks ix_followSeer_seer_id_user_id in order
+        order_by(FollowSeer.c.user_id).limit(limit)
     )
     followers = (await session.execute(stmt)).all()
     return SeerFollowers(followers=followers)
 
 
 async def get_seer_total_followers(session: AsyncSession, seer_id: int):
-    stmt = (
-        select(func.count()).select_from(FollowSeer).
-        where(FollowSeer.c.seer_id == seer_id)
-    )
-    return (await session.scalars(stmt)).one()
+    stmt = select(Seer.follower_count).where(Seer.id == seer_id)
+    return (await session.scalar(stmt)) or 0
 
 
 def simplify_schedules(schedules: list[SeerScheduleIn]):
@@ -162,12 +181,14 @@ def simplify_schedules(schedules: list[SeerScheduleIn]):
     return merged
 
 
-async def get_schedules(session: AsyncSession, seer_id: int):
+async def get_schedules(session: AsyncSession, seer_id: int, day: int = None):
     stmt = (
         select(Schedule).
         where(Schedule.seer_id == seer_id).
         order_by(Schedule.day, Schedule.start_time)
     )
+    if day is not None:
+        stmt = stmt.where(Schedule.day == day)
     return (await session.scalars(stmt)).all()
 
 
@@ -195,23 +216,76 @@ async def get_day_offs(
     return (await session.scalars(stmt)).all()
 
 
-async def delete_extra_schedules(
+async def replace_schedules(
     session: AsyncSession,
     seer_id: int,
-    day: int,
-    start_time: dt.time
+    schedules: list[SeerScheduleIn],
+    *,
+    commit: bool = True
 ):
-    '''No commit here'''
-    stmt = (
-        delete(Schedule).
-        where(
-            Schedule.seer_id == seer_id,
-            Schedule.day >= day,
-            Schedule.start_time >= start_time
+    '''
+    Replace schedules of seer with `schedules` (already simplified)
+    in one statement. Unchanged rows keep their ids, rows not in
+    `schedules` are deleted and missing ones inserted.
+    Return the resulting schedules ordered by day and start time.
+    '''
+    if not schedules:
+        await session.execute(
+            delete(Schedule).where(Schedule.seer_id == seer_id)
         )
-    )
-    deleted_count = (await session.execute(stmt)).rowcount
-    return deleted_count
+        rows = []
+    else:
+        want = values(
+            column('day', Schedule.day.type),
+            column('start_time', Schedule.start_time.type),
+            column('end_time', Schedule.end_time.type),
+            name='want'
+        ).data([
+            (sch.day, sch.start_time, sch.end_time) for sch in schedules
+        ])
+        same = and_(
+            want.c.day == Schedule.day,
+            want.c.start_time == Schedule.start_time,
+            want.c.end_time == Schedule.end_time
+        )
+        deleted = (
+            delete(Schedule).
+            where(
+                Schedule.seer_id == seer_id,
+                ~exists().where(same)
+            ).
+            returning(Schedule.id).
+            cte('deleted')
+        )
+        inserted = (
+            insert(Schedule).
+            from_select(
+                ['seer_id', 'day', 'start_time', 'end_time'],
+                select(literal(seer_id), want).
+                where(~exists().where(Schedule.seer_id == seer_id, same))
+            ).
+            returning(Schedule.day, Schedule.start_time, Schedule.end_time).
+            cte('inserted')
+        )
+        # Main query sees the rows before the CTEs modify them
+        kept = (
+            select(Schedule.day, Schedule.start_time, Schedule.end_time).
+            where(
+                Schedule.seer_id == seer_id,
+                Schedule.id.not_in(select(deleted.c.id))
+            )
+        )
+        stmt = (
+            union_all(kept, select(inserted)).
+            order_by('day', 'start_time').
+            add_cte(deleted)
+        )
+        rows = (await session.execute(stmt)).all()
+
+    await invalidate(session, seer_tag(seer_id))
+    if commit:
+        await session.commit()
+    return rows
 
 
 async def add_dayoff(day_off: SeerDayOff, seer_id: int, session: AsyncSession):
@@ -219,6 +293,7 @@ async def add_dayoff(day_off: SeerDayOff, seer_id: int, session: AsyncSession):
     day_off_dict["seer_id"] = seer_id
     stmt = pg_insert(DayOff).values(day_off_dict).on_conflict_do_nothing()
     await session.execute(stmt)
+    await invalidate(session, seer_tag(seer_id))
     await session.commit()
     return day_off
 
@@ -229,6 +304,7 @@ async def delete_dayoff(day_off: dt.date, seer_id: int, session: AsyncSession):
         where(DayOff.seer_id == seer_id, DayOff.day_off == day_off)
     )
     deleted_count = (await session.execute(stmt)).rowcount
+    await invalidate(session, seer_tag(seer_id))
     await session.commit()
     return deleted_count
 
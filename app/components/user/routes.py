@@ -2,7 +2,6 @@ import re
 from datetime import timedelta
 from fastapi import (
     APIRouter,
-    BackgroundTasks,
     Query,
     Request,
     status,
@@ -12,6 +11,7 @@ from sqlalchemy import delete, func, select, text, update, insert
 from sqlalchemy.exc import NoResultFound, IntegrityError
 
 from app.components.seer.schemas import FollowProfile
+from app.core.cache import FPACKAGE_SEARCH_TAG, invalidate, seer_tag
 from app.core.config import settings
 from app.core.deps import AdminJWTDep, SortingOrder, UserJWTDep
 from app.core.error import (
@@ -28,9 +28,9 @@ from app.core.security import (
 )
 from app.core.schemas import Message, UserId, RowCount
 from app.database import SessionDep
-from app.database.models import User, FollowSeer
+from app.database.models import User, Seer, FollowSeer
 from app.database.utils import parse_unique_violation
-from app.trigger import send_verify_email, send_change_password
+from app.trigger.outbox import queue_verify_email, queue_change_password
 from ..seer.service import check_active_seer
 from . import responses as res
 from .schemas import (
@@ -57,7 +57,6 @@ async def register(
     user: UserRegister,
     session: SessionDep,
     request: Request,
-    bg_tasks: BackgroundTasks
 ):
     """
     สมัครบัญชีผู้ใช้งานฝั่งลูกค้า:
@@ -74,18 +73,23 @@ async def register(
     - **properties**: ไม่บังคับ ระบุคุณสมบัติเพิ่มเติม
      อย่างเช่น **reading_type** (ชนิดการดูดวง) และ **interested_topics** (เรื่องที่สนใจ)
     """
-    new_user = await create_user(session, User(**user.model_dump()))
+    user.password = await hash_password(user.password)
+    # User and its verification email are committed together
+    new_user = await create_user(
+        session, User(**user.model_dump()), commit=False
+    )
     token = create_jwt({"vrf": new_user.id}, timedelta(days=1))
     url = "https://qseer.app/verify?token=" + token
     if not settings.DEVELOPMENT:
-        bg_tasks.add_task(
-            send_verify_email,
+        await queue_verify_email(
+            session,
             user.email,
             #request.url_for("verify_user", token=token)._url
             url
         )
     else:
         print(token)
+    await session.commit()
     return UserId(id=new_user.id)
 
 
@@ -115,13 +119,12 @@ async def resend_email(
     token = create_jwt({"vrf": user_id}, timedelta(days=1))
     url = "https://qseer.app/verify?token=" + token
     if not settings.DEVELOPMENT:
-        success = await send_verify_email(
+        await queue_verify_email(
+            session,
             user_email.email,
             #request.url_for("verify_user", token=token)._url
             url
         )
-        if not success:
-            raise InternalException({"detail": "Failed to send email."})
     else:
         print(token)
     await session.commit()
@@ -157,7 +160,6 @@ async def verify_user(token: str, session: SessionDep):
 async def change_password(
     user_email: UserEmail,
     session: SessionDep,
-    bg_tasks: BackgroundTasks
 ):
     try:
         user_id = (await session.scalars(
@@ -173,11 +175,8 @@ async def change_password(
         print(token)
         print("---------------------------------------")
         url = "https://qseer.app/reset-password?token="+token
-        bg_tasks.add_task(
-        send_change_password,
-        user_email.email,
-        url
-        )
+        await queue_change_password(session, user_email.email, url)
+        await session.commit()
     else:
         print("----------------Token------------------")
         print(token)
@@ -195,10 +194,11 @@ async def change_password(
 async def forgot_password(body: UserResetPassword, session: SessionDep):
     payload = decode_jwt(body.token, require=["exp", "passwd"])
     user_id = payload["passwd"]
+    password = await hash_password(body.password)
     stmt = (
         update(User).
         where(User.id == user_id, User.is_active == True).
-        values(password=hash_password(body.password)).
+        values(password=password).
         returning(User.id)
     )
     try:
@@ -241,6 +241,8 @@ async def update_self_info(user: UserUpdate, payload: UserJWTDep, session: Sessi
         returning(*user_cols)
     )
     result = (await session.execute(stmt)).one_or_none()
+    # Seer profile and package search cards show user fields
+    await invalidate(session, seer_tag(user_id), FPACKAGE_SEARCH_TAG)
     await session.commit()
     if result is None:
         raise NotFoundException("User not found.")
@@ -271,6 +273,7 @@ async def set_user_username(body: UserUsername, payload: UserJWTDep, session: Se
         count = (await session.execute(stmt)).rowcount
         if count <= 0:
             raise BadRequestException("Username has already been set.")
+        await invalidate(session, seer_tag(payload.sub))
         await session.commit()
     except IntegrityError as e:
         detail = {"type": "IntegrityError", "detail": "Unknown error."}
@@ -334,10 +337,18 @@ async def post_follow_seer(seer_id: int, payload: UserJWTDep, session: SessionDe
         await check_active_seer(seer_id, session)
     except NoResultFound:
         raise NotFoundException("Seer not found.")
-    stmt = (
+    followed = (
         insert(FollowSeer).
         values(user_id=user_id, seer_id=seer_id).
-        returning(FollowSeer.c.seer_id)
+        returning(FollowSeer.c.seer_id).
+        cte('followed')
+    )
+    stmt = (
+        update(Seer).
+        where(Seer.id == followed.c.seer_id).
+        values(follower_count=Seer.follower_count + 1).
+        returning(Seer.id).
+        add_cte(followed)
     )
     try:
         result = (await session.scalars(stmt)).one()
@@ -355,14 +366,22 @@ async def delete_follow_seer(seer_id: int, payload: UserJWTDep, session: Session
     เลิกติดตามหมอดู
     '''
     user_id = payload.sub
-    delete_stmt = (
-        delete(FollowSeer)
-        .where(
+    unfollowed = (
+        delete(FollowSeer).
+        where(
             FollowSeer.c.seer_id == seer_id,
             FollowSeer.c.user_id == user_id
-        )
+        ).
+        returning(FollowSeer.c.seer_id).
+        cte('unfollowed')
+    )
+    stmt = (
+        update(Seer).
+        where(Seer.id == unfollowed.c.seer_id).
+        values(follower_count=Seer.follower_count - 1).
+        add_cte(unfollowed)
     )
-    count = (await session.execute(delete_stmt)).rowcount
+    count = (await session.execute(stmt)).rowcount
     await session.commit()
     return RowCount(count=count)
 
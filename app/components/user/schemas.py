@@ -9,7 +9,6 @@ from pydantic import (
     field_validator,
 )
 
-from app.core.security import hash_password
 from app.core.deps import EmailLower
 from ..seer.schemas import FollowProfile
 
@@ -60,11 +59,6 @@ class UserRegister(BaseModel):
             raise ValueError("Invalid username")
         return v
 
-    @field_validator("password")
-    @classmethod
-    def hashing_password(cls, v: str) -> str:
-        return hash_password(v)
-
 
 class UserOut(BaseModel):
     id: int = Field(examples=[1])
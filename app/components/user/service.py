@@ -17,11 +17,19 @@ from app.database.models import User
 from app.database.utils import parse_unique_violation, parse_not_null_violation
 
 
-async def create_user(session: AsyncSession, new_user: User) -> User:
+async def create_user(
+    session: AsyncSession,
+    new_user: User,
+    *,
+    commit: bool = True
+) -> User:
     try:
         session.add(new_user)
-        await session.commit()
-        await session.refresh(new_user, ["id"])
+        if commit:
+            await session.commit()
+            await session.refresh(new_user, ["id"])
+        else:
+            await session.flush()
     except IntegrityError as e:
         detail = {"type": "IntegrityError", "detail": "Unknown error."}
         if isinstance(e.orig, UniqueViolation):
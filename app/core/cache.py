@@ -0,0 +1,223 @@
+import asyncio
+import functools
+import inspect
+from collections import defaultdict
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+from cachetools import TTLCache
+from fastapi import Request, Response
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.pagination import Page, set_next_cursor
+from app.database import ReadSessionDep
+from app.database.connection import async_session
+from app.database.listener import pg_listener
+
+T = TypeVar('T')
+
+INVALIDATE_CHANNEL = "cache_invalidate"
+
+_caches: list['TaggedCache'] = []
+
+
+class TaggedCache:
+    '''
+    Per-worker TTL cache whose entries are tagged, e.g. with `seer_tag(seer_id)`.
+
+    `invalidate(session, *tags)` drops every entry with one of the tags
+    in all workers once the transaction commits. A value loaded while
+    one of its tags is invalidated is not stored, so a slow load never
+    puts data older than the invalidation back in the cache.
+    '''
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache: TTLCache = TTLCache(maxsize, ttl)
+        self._tags: dict[str, set[Hashable]] = defaultdict(set)
+        self._versions: dict[str, int] = defaultdict(int)
+        self._loading: dict[Hashable, asyncio.Task] = {}
+        _caches.append(self)
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        tags: tuple[str, ...],
+        loader: Callable[[], Awaitable[T]]
+    ) -> T:
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        loading = self._loading.get(key)
+        if loading is None:
+            loading = asyncio.create_task(self._load(key, tags, loader))
+            self._loading[key] = loading
+        return await asyncio.shield(loading)
+
+    async def _load(self, key, tags, loader):
+        versions = [self._versions[tag] for tag in tags]
+        try:
+            value = await loader()
+        finally:
+            del self._loading[key]
+        if versions == [self._versions[tag] for tag in tags]:
+            self._cache[key] = value
+            for tag in tags:
+                self._tags[tag].add(key)
+            if len(self._tags) > 2 * self._cache.maxsize:
+                self._prune()
+        return value
+
+    def drop(self, *tags: str):
+        for tag in tags:
+            self._versions[tag] += 1
+            for key in self._tags.pop(tag, ()):
+                self._cache.pop(key, None)
+
+    def clear(self):
+        for tag in list(self._tags):
+            self.drop(tag)
+        self._cache.clear()
+
+    def _prune(self):
+        '''
+        Forget tags whose entries were all evicted or expired.
+        '''
+        self._cache.expire()
+        for tag, keys in list(self._tags.items()):
+            keys.intersection_update(self._cache.keys())
+            if not keys:
+                del self._tags[tag]
+
+
+SEER_TAG = "seer:{seer_id}"
+AUCTION_TAG = "auction:{auction_id}"
+# Results span many seers, dropped on any change to published packages
+FPACKAGE_SEARCH_TAG = "fpackage:search"
+
+
+def seer_tag(seer_id: int) -> str:
+    return SEER_TAG.format(seer_id=seer_id)
+
+
+def auction_tag(auction_id: int) -> str:
+    return AUCTION_TAG.format(auction_id=auction_id)
+
+
+response_cache = TaggedCache(
+    settings.RESPONSE_CACHE_SIZE, settings.RESPONSE_CACHE_TTL
+)
+
+
+def cached(*tags: str):
+    '''
+    Cache the result of a public route in `response_cache`, keyed by its
+    parameters. `tags` are templates filled from the parameters, e.g.
+    `@cached(SEER_TAG)` tags the entry with `seer_tag(seer_id)`, so write
+    paths drop it with `invalidate`. Exceptions are not cached.
+
+    Sessions, requests and responses are left out of the key, the
+    `X-Next-Cursor` header of a cached `Page` is set on every hit.
+    The load is shared by concurrent requests, so the route runs with its
+    own session and response instead of those of the first request,
+    which are closed if that client disconnects.
+
+    Routes must read from the primary (`SessionDep`). Invalidation runs
+    when the primary commits, a replica that has not replayed the write
+    yet would put the old data back for `RESPONSE_CACHE_TTL`.
+    '''
+    def decorator(route):
+        for param in inspect.signature(route).parameters.values():
+            if param.annotation is ReadSessionDep:
+                raise TypeError(
+                    f"{route.__qualname__}: cached routes can not use ReadSessionDep"
+                )
+
+        @functools.wraps(route)
+        async def wrapper(**kwargs):
+            params = {
+                k: _hashable(v) for k, v in kwargs.items()
+                if not isinstance(v, (AsyncSession, Request, Response))
+            }
+            key = (route.__module__, route.__qualname__, *sorted(params.items()))
+
+            async def load():
+                async with async_session() as session:
+                    return await route(**{
+                        k: (
+                            session if isinstance(v, AsyncSession)
+                            else Response() if isinstance(v, Response)
+                            else v
+                        )
+                        for k, v in kwargs.items()
+                    })
+
+            value = await response_cache.get_or_load(
+                key,
+                tuple(tag.format(**params) for tag in tags),
+                load
+            )
+            response = kwargs.get('response')
+            if isinstance(value, Page) and isinstance(response, Response):
+                set_next_cursor(response, value)
+            return value
+        return wrapper
+    return decorator
+
+
+def _hashable(value):
+    '''
+    List query parameters are keyed as tuples.
+    '''
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_hashable(v) for v in value)
+    return value
+
+
+async def invalidate(session: AsyncSession, *tags: str):
+    '''
+    Invalidate cache entries with `tags` in every worker.
+    Takes effect when the transaction commits. No commit here.
+    '''
+    await session.execute(
+        select(func.pg_notify(INVALIDATE_CHANNEL, " ".join(tags)))
+    )
+    session.info.setdefault('cache_tags', set()).update(tags)
+
+
+def drop_tags(*tags: str):
+    for cache in _caches:
+        cache.drop(*tags)
+
+
+def on_invalidate(payload: str):
+    drop_tags(*payload.split())
+
+
+def clear_caches():
+    '''
+    Notifications may be missed while listener is disconnected.
+    '''
+    for cache in _caches:
+        cache.clear()
+
+
+pg_listener.listen(INVALIDATE_CHANNEL, on_invalidate)
+pg_listener.on_reconnect(clear_caches)
+
+
+@event.listens_for(Session, "after_commit")
+def drop_committed_tags(session: Session):
+    # Drop in this worker right away, before the notification arrives
+    tags = session.info.pop('cache_tags', None)
+    if tags:
+        drop_tags(*tags)
+
+
+@event.listens_for(Session, "after_rollback")
+def forget_tags(session: Session):
+    session.info.pop('cache_tags', None)
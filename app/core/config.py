@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import computed_field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from sqlalchemy import URL
@@ -13,17 +15,84 @@ class Settings(BaseSettings):
     PG_HOST: str = "10.0.10.13"
     PG_PORT: int = 5432
     PG_DATABASE: str = "test"
+    # Read-only replica for public browse endpoints, uses primary if not set
+    PG_REPLICA_HOST: str | None = None
+    PG_REPLICA_PORT: int | None = None
+
+    # Engine pool is per worker, total connections are
+    # WEB_CONCURRENCY * (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_QUERY_CACHE_SIZE: int = 500
+    # Server-side prepare after a statement is executed this many times,
+    # None disables prepared statements (needed behind pgbouncer)
+    PG_PREPARE_THRESHOLD: int | None = 5
+    # Milliseconds, 0 is no timeout
+    PG_STATEMENT_TIMEOUT: int = 0
 
     TRIGGER_URL: str
     TRIGGER_SECRET: str
+    TRIGGER_TIMEOUT: float = 30
+    TRIGGER_CONNECT_TIMEOUT: float = 5
+    # Retry on connection failure only, requests are not re-sent
+    TRIGGER_RETRIES: int = 2
+    TRIGGER_MAX_CONNECTIONS: int = 20
+    TRIGGER_KEEPALIVE_EXPIRY: float = 60
+    # HTTP/2 needs `h2` package and https trigger url
+    TRIGGER_HTTP2: bool = False
+    TRIGGER_OUTBOX_BATCH: int = 50
+    TRIGGER_OUTBOX_POLL_INTERVAL: float = 1
+    # Seconds a claimed row is hidden from other dispatchers
+    TRIGGER_OUTBOX_LEASE: float = 120
+    TRIGGER_OUTBOX_MAX_ATTEMPTS: int = 20
+    TRIGGER_OUTBOX_BACKOFF: float = 2
+    TRIGGER_OUTBOX_MAX_BACKOFF: float = 600
+
+    # Conclude auctions in-process instead of trigger service callback
+    AUCTION_SCHEDULER: bool = False
+    # Seconds ahead of now that ending auctions are kept in memory
+    AUCTION_SCHEDULER_HORIZON: float = 300
+    AUCTION_SCHEDULER_REFRESH: float = 60
+    AUCTION_SCHEDULER_CONCURRENCY: int = 10
+
+    # Free time slots per (seer, package, date range), dropped when seer changes
+    AVAILABILITY_CACHE_SIZE: int = 1024
+    AVAILABILITY_CACHE_TTL: float = 300
+    # Public read routes decorated with `cached`
+    RESPONSE_CACHE_SIZE: int = 4096
+    RESPONSE_CACHE_TTL: float = 60
+
+    # Cost of new password hashes, existing hashes keep their own
+    BCRYPT_ROUNDS: int = 12
+    # Threads hashing passwords per worker
+    BCRYPT_CONCURRENCY: int = 2
+
+    # Decoded JWT payloads, kept until the token expires
+    AUTH_CACHE_SIZE: int = 10000
 
     GOOGLE_CLIENT_ID: str
+    # PEM certs by key id, cached as long as the response allows
+    GOOGLE_CERTS_URL: str = "https://www.googleapis.com/oauth2/v1/certs"
 
     secret_dp_S3_ACCOUNT_ID: str
     secret_dp_S3_ACCESS_KEY: str
     secret_dp_S3_SECRET: str
 
     main_BUCKET_NAME: str
+    # Any S3-compatible endpoint, R2 of the account if not set
+    S3_ENDPOINT_URL: str | None = None
+    # Uploads and deletes running at once per worker
+    S3_CONCURRENCY: int = 4
+    S3_MULTIPART_THRESHOLD_MB: int = 8
+
+    # Uploaded images are re-encoded in this many processes per worker
+    IMAGE_PROCESS_WORKERS: int = 2
+    IMAGE_FORMAT: Literal["WEBP", "AVIF"] = "WEBP"
+    IMAGE_QUALITY: int = 80
 
     @computed_field
     @property
@@ -37,6 +106,16 @@ class Settings(BaseSettings):
             database=self.PG_DATABASE
         )
 
+    @computed_field
+    @property
+    def READ_DATABASE_URL(self) -> URL | None:
+        if self.PG_REPLICA_HOST is None:
+            return None
+        return self.DATABASE_URL.set(
+            host=self.PG_REPLICA_HOST,
+            port=self.PG_REPLICA_PORT or self.PG_PORT
+        )
+
     model_config = SettingsConfigDict(
         env_file=".env", env_ignore_empty=True, extra="ignore")
 
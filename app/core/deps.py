@@ -1,5 +1,7 @@
+import time
 from typing import Any, Annotated, Generic, Literal, TypeVar
 
+from cachetools import TLRUCache
 from fastapi.security import APIKeyCookie, HTTPBearer
 from pydantic import AfterValidator, BaseModel, EmailStr
 from starlette.status import HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN
@@ -13,9 +15,21 @@ COOKIE_NAME = "token"
 M = TypeVar('M', bound=BaseModel)
 
 
+def _until_exp(token: str, payload: tuple[Any, float], now: float) -> float:
+    return payload[1]
+
+
 class JWTCookie(APIKeyCookie, Generic[M]):
+    '''
+    Validated payloads are kept by token until the token expires,
+    so a repeated token is a dict lookup instead of decoding again.
+    '''
+
     def __init__(self, name: str, require: type[M] | tuple[str, ...] = (), **kwargs):
         super().__init__(name=name, **kwargs)
+        self._payloads: TLRUCache[str, tuple[Any, float]] = TLRUCache(
+            settings.AUTH_CACHE_SIZE, _until_exp, timer=time.time
+        )
         if isinstance(require, tuple):
             self.token_model = dict
             self.require = require
@@ -34,7 +48,14 @@ class JWTCookie(APIKeyCookie, Generic[M]):
                 )
             else:
                 return None
-        return self.token_model(**decode_jwt(api_key, self.require))
+        cached = self._payloads.get(api_key)
+        if cached is not None:
+            return cached[0]
+        claims = decode_jwt(api_key, self.require)
+        payload = self.token_model(**claims)
+        if self.token_model is not dict:
+            self._payloads[api_key] = (payload, claims.get('exp', float('inf')))
+        return payload
 
 
 cookie_scheme = JWTCookie(
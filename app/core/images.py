@@ -0,0 +1,42 @@
+'''
+Runs in the image process pool of `app.components.images`. Imports only
+Pillow, so pool processes unpickling `make_variants` do not build the app.
+'''
+import io
+import warnings
+
+from PIL import Image, ImageOps, features
+
+FULL = "full"
+# Longest side in px, smaller images are not upscaled
+IMAGE_VARIANTS = {"thumb": 160, "card": 640, FULL: 1920}
+# Pillow only warns up to twice this, `make_variants` refuses anything
+# above it, about 8000 x 8000 (256 MB as RGBA)
+Image.MAX_IMAGE_PIXELS = 64_000_000
+
+
+def check_format(image_format: str) -> bool:
+    '''
+    Whether this Pillow build can encode `image_format`.
+    '''
+    return features.check(image_format.lower())
+
+
+def make_variants(data: bytes, image_format: str, quality: int) -> dict[str, bytes]:
+    '''
+    Decodes, applies EXIF orientation and re-encodes every variant
+    without metadata.
+    '''
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", Image.DecompressionBombWarning)
+        with Image.open(io.BytesIO(data)) as image:
+            image = ImageOps.exif_transpose(image)
+            image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+    variants = {}
+    for variant, size in IMAGE_VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+        output = io.BytesIO()
+        resized.save(output, image_format, quality=quality)
+        variants[variant] = output.getvalue()
+    return variants
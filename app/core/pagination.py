@@ -0,0 +1,89 @@
+import base64
+import datetime as dt
+import json
+from typing import Any, Sequence
+
+from fastapi import Response
+from sqlalchemy import ColumnElement, Row, Select, asc, desc, literal, tuple_
+
+from app.core.deps import SortingOrder
+from app.core.error import BadRequestException
+
+CURSOR_HEADER = "X-Next-Cursor"
+SORT_KEY = "sort_key"
+'''Label of the sort column added to statements by `paginate`'''
+
+
+class Page(list):
+    '''
+    Items of a page, `next_cursor` is None on the last page.
+    '''
+    next_cursor: str | None = None
+
+
+def encode_cursor(sort_key: Any, id: int) -> str:
+    if isinstance(sort_key, dt.datetime):
+        sort_key = sort_key.isoformat()
+    raw = json.dumps([sort_key, id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, sort_col: ColumnElement) -> tuple[Any, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort_key, id = json.loads(raw)
+        if sort_col.type.python_type is dt.datetime:
+            sort_key = dt.datetime.fromisoformat(sort_key)
+        if not isinstance(id, int):
+            raise ValueError
+    except (ValueError, TypeError, NotImplementedError):
+        raise BadRequestException("Invalid cursor.")
+    return sort_key, id
+
+
+def paginate(
+    stmt: Select,
+    sort_col: ColumnElement,
+    id_col: ColumnElement,
+    direction: SortingOrder,
+    cursor: str | None
+) -> Select:
+    '''
+    Order `stmt` by `(sort_col, id_col)` and continue after `cursor` with a
+    row-value comparison, so it is one range scan on a `(sort_col, id)`
+    index however deep the page is. `sort_col` is added to the selected
+    columns as `SORT_KEY` for `make_page`.
+    '''
+    order = asc if direction == 'asc' else desc
+    stmt = stmt.add_columns(sort_col.label(SORT_KEY))
+    if sort_col is id_col:
+        stmt = stmt.order_by(order(id_col))
+    else:
+        stmt = stmt.order_by(order(sort_col), order(id_col))
+    if cursor is None:
+        return stmt
+
+    sort_key, id = decode_cursor(cursor, sort_col)
+    if sort_col is id_col:
+        after = id_col > id if direction == 'asc' else id_col < id
+    else:
+        key = tuple_(sort_col, id_col)
+        last = tuple_(literal(sort_key, sort_col.type), literal(id))
+        after = key > last if direction == 'asc' else key < last
+    return stmt.where(after)
+
+
+def make_page(items: list, rows: Sequence[Row], limit: int | None) -> Page:
+    '''
+    `rows` are the rows of a statement from `paginate`, `items` the
+    models created from them.
+    '''
+    page = Page(items)
+    if rows and limit is not None and len(rows) == limit:
+        page.next_cursor = encode_cursor(getattr(rows[-1], SORT_KEY), rows[-1].id)
+    return page
+
+
+def set_next_cursor(response: Response, page: Page):
+    if page.next_cursor is not None:
+        response.headers[CURSOR_HEADER] = page.next_cursor
@@ -20,9 +20,14 @@ class Message(BaseModel):
 
 
 class TokenPayload(BaseModel):
+    '''
+    Frozen, one instance is shared by every request with the same token.
+    '''
     exp: Any = Field(examples=[1800000000])
     sub: int
-    roles: list[str] = Field(examples=[["seer"]])
+    roles: tuple[str, ...] = Field(examples=[["seer"]])
+
+    model_config = ConfigDict(frozen=True)
     
     @property
     def is_seer(self) -> bool:
@@ -1,3 +1,5 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Any
 from fastapi import HTTPException
@@ -19,15 +21,31 @@ ALGORITHM = "HS256"
 disable_warning_obj = (lambda: None)
 disable_warning_obj.__version__ = '4.2.1'
 bcrypt.__about__ = disable_warning_obj
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS
+)
+# bcrypt releases the GIL, threads run hashes in parallel while the
+# event loop keeps serving. Extra calls queue instead of adding threads.
+_bcrypt_executor = ThreadPoolExecutor(
+    max_workers=settings.BCRYPT_CONCURRENCY,
+    thread_name_prefix="bcrypt"
+)
 
 
-def hash_password(password):
-    return pwd_context.hash(password)
+async def hash_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _bcrypt_executor, pwd_context.hash, password
+    )
 
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password: str, hashed_password: str | None) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _bcrypt_executor, pwd_context.verify, plain_password, hashed_password
+    )
 
 
 def create_jwt(data: dict, expires_delta: timedelta | None = None):
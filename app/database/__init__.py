@@ -8,4 +8,11 @@
 ╰─────────────────────╯
 '''
 from .models import Base
-from .connection import get_session, create_tables, SessionDep
\ No newline at end of file
+from .connection import (
+    get_session,
+    get_read_session,
+    create_tables,
+    pool_stats,
+    SessionDep,
+    ReadSessionDep,
+)
\ No newline at end of file
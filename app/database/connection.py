@@ -10,16 +10,86 @@ from sqlalchemy.ext.asyncio import (
 from app.core.config import settings
 from .models import *
 
+
+def connect_args(read_only: bool = False) -> dict:
+    '''
+    psycopg connection arguments from settings.
+    '''
+    args = {"prepare_threshold": settings.PG_PREPARE_THRESHOLD}
+    options = []
+    if settings.PG_STATEMENT_TIMEOUT > 0:
+        options.append(f"-c statement_timeout={settings.PG_STATEMENT_TIMEOUT}")
+    if read_only:
+        options.append("-c default_transaction_read_only=on")
+    if options:
+        args["options"] = " ".join(options)
+    return args
+
+
+def new_engine(url, read_only: bool = False):
+    return create_async_engine(
+        url,
+        echo=settings.DB_ECHO,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+        connect_args=connect_args(read_only),
+    )
+
+
 # engine = create_engine(settings.DATABASE_URL, echo=settings.DEVELOPMENT)
-engine = create_async_engine(settings.DATABASE_URL, echo=settings.DEVELOPMENT)
+engine = new_engine(settings.DATABASE_URL)
 async_session = async_sessionmaker(engine, expire_on_commit=False)
 
+if settings.READ_DATABASE_URL is not None:
+    read_engine = new_engine(settings.READ_DATABASE_URL, read_only=True)
+else:
+    read_engine = engine
+async_read_session = async_sessionmaker(read_engine, expire_on_commit=False)
+
 
 async def get_session():
     async with async_session() as session:
         yield session
 
 
+def engine_pool_stats(engine) -> dict[str, int]:
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+    }
+
+
+def pool_stats() -> dict[str, dict[str, int] | None]:
+    '''
+    Connection pool usage of `engine` and `read_engine` in this worker,
+    `replica` is None when reads use the primary.
+    '''
+    return {
+        "primary": engine_pool_stats(engine),
+        "replica": (
+            engine_pool_stats(read_engine)
+            if read_engine is not engine else None
+        ),
+    }
+
+
+async def get_read_session():
+    '''
+    Session bound to the read replica. Replica may lag behind primary,
+    use `get_session` when the request must read its own writes.
+    '''
+    async with async_read_session() as session:
+        yield session
+
+
 async def create_tables():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
@@ -27,3 +97,4 @@ async def create_tables():
 
 
 SessionDep = Annotated[AsyncSession, Depends(get_session)]
+ReadSessionDep = Annotated[AsyncSession, Depends(get_read_session)]
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Awaitable, Callable
+
+import psycopg
+from psycopg import sql
+
+from app.core.config import settings
+
+logger = logging.getLogger('uvicorn.error')
+
+NotifyCallback = Callable[[str], Awaitable[None] | None]
+ReconnectCallback = Callable[[], Awaitable[None] | None]
+
+
+class PgListener:
+    '''
+    One dedicated connection per worker that `LISTEN`s on channels
+    and dispatches `NOTIFY` payloads to registered callbacks.
+
+    The connection is not taken from the engine pool, so it never
+    competes with request handlers for a pooled connection.
+    '''
+
+    def __init__(self, retry_delay: float = 1.0, max_retry_delay: float = 30.0):
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._callbacks: dict[str, list[NotifyCallback]] = defaultdict(list)
+        self._on_reconnect: list[ReconnectCallback] = []
+        self._task: asyncio.Task | None = None
+
+    def listen(self, channel: str, callback: NotifyCallback):
+        '''
+        Register `callback(payload)` for `channel`.
+        Must be called before `start()`.
+        '''
+        self._callbacks[channel].append(callback)
+
+    def on_reconnect(self, callback: ReconnectCallback):
+        '''
+        Register `callback()` that runs after the connection was lost
+        and established again, since notifications may have been missed.
+        '''
+        self._on_reconnect.append(callback)
+
+    async def start(self):
+        if self._task is None and self._callbacks:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        delay = self.retry_delay
+        first = True
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(
+                    conninfo(), autocommit=True
+                ) as conn:
+                    for channel in self._callbacks:
+                        await conn.execute(
+                            sql.SQL("LISTEN {}").format(sql.Identifier(channel))
+                        )
+                    delay = self.retry_delay
+                    if not first:
+                        for callback in self._on_reconnect:
+                            await _call(callback)
+                    first = False
+                    async for notify in conn.notifies():
+                        for callback in self._callbacks.get(notify.channel, ()):
+                            try:
+                                await _call(callback, notify.payload)
+                            except Exception:
+                                logger.exception(
+                                    f"Notify callback failed ({notify.channel})"
+                                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Listener connection lost: {e!r}")
+            first = False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_retry_delay)
+
+
+async def _call(callback, *args):
+    result = callback(*args)
+    if asyncio.iscoroutine(result):
+        await result
+
+
+def conninfo() -> str:
+    '''
+    libpq connection string of `settings.DATABASE_URL` for raw psycopg connections.
+    '''
+    return (
+        settings.DATABASE_URL.
+        set(drivername="postgresql").
+        render_as_string(hide_password=False)
+    )
+
+
+pg_listener = PgListener()
@@ -33,7 +33,15 @@ from sqlalchemy.orm import (
     mapped_column,
     relationship,
 )
-from sqlalchemy.dialects.postgresql import ARRAY, JSONB, REAL, SMALLINT
+from sqlalchemy.dialects.postgresql import (
+    ARRAY,
+    ExcludeConstraint,
+    JSONB,
+    REAL,
+    SMALLINT,
+    TSTZRANGE,
+    Range,
+)
 from sqlalchemy.engine import Connection
 from sqlalchemy.sql import compiler
 
@@ -100,7 +108,9 @@ FollowSeer = Table(
     Column(
         "seer_id", ForeignKey("seer.id", ondelete="CASCADE"),
         primary_key=True
-    )
+    ),
+    # Followers of seer, primary key covers followed seers of user
+    Index('ix_followSeer_seer_id_user_id', 'seer_id', 'user_id')
 )
 '''Contains `user_id` and `seer_id` columns'''
 
@@ -191,6 +201,16 @@ class User(Base):
     #     passive_deletes=True
     # )  # on delete cascade
 
+    __table_args__ = (
+        # display_name ILIKE '...%'
+        Index(
+            'ix_userAccount_display_name_trgm',
+            'display_name',
+            postgresql_using='gin',
+            postgresql_ops={'display_name': 'gin_trgm_ops'}
+        ),
+    )
+
     def __repr__(self) -> str:
         return f"User(id={self.id!r}, email={self.email!r})"
 
@@ -240,6 +260,12 @@ class Seer(Base):
         REAL(), server_default=text("null")
     )
     review_count: Mapped[int] = mapped_column(server_default=text("0"))
+    # Rows in `followSeer`, maintained by follow and unfollow routes
+    follower_count: Mapped[int] = mapped_column(server_default=text("0"))
+    # Sum of review scores, rating is rating_sum / review_count
+    rating_sum: Mapped[int] = mapped_column(
+        BigInteger, server_default=text("0")
+    )
     break_duration: Mapped[dt.timedelta] = mapped_column(
         server_default=text("'0'")
     )
@@ -352,6 +378,13 @@ class Withdrawal(Base):
 
     # seer: Mapped[Seer] = relationship(back_populates="withdrawals")
 
+    __table_args__ = (
+        Index(
+            'ix_withdrawal_requester_id_status',
+            'requester_id', 'status'
+        ),
+    )
+
 
 '''
  ███████████                     █████                                 
@@ -410,6 +443,18 @@ class FortunePackage(Base):
 
     # seer: Mapped[Seer] = relationship(back_populates="fortune_packages")
 
+    __table_args__ = (
+        # Search keyset on id, mostly filtered by status
+        Index('ix_fortunePackage_status_id', 'status', 'id'),
+        # name ILIKE '%...%'
+        Index(
+            'ix_fortunePackage_name_trgm',
+            'name',
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'}
+        ),
+    )
+
 
 class QuestionPackage(Base):
     __tablename__ = "questionPackage"
@@ -440,6 +485,11 @@ class Activity(Base):
         "polymorphic_on": "type",
     }
 
+    __table_args__ = (
+        # Keyset pagination of auctions by date_created
+        Index('ix_activity_date_created_id', 'date_created', 'id'),
+    )
+
 
 class ApmtStatus(str, pyEnum):
     pending = "pending"
@@ -494,7 +544,17 @@ class Appointment(Activity):
         CheckConstraint(
             "client_id IS NOT NULL and seer_id IS NOT NULL",
             name="client_seer_not_null"
-        )
+        ),
+        # Busy time ranges of seer
+        Index(
+            'ix_appointment_seer_id_start_time',
+            'seer_id', 'start_time', 'end_time'
+        ),
+        # Appointment lists keyset on id
+        Index('ix_appointment_seer_id_id', 'seer_id', 'id'),
+        Index('ix_appointment_client_id_id', 'client_id', 'id'),
+        # Monthly cancel quota, date_created is in activity
+        Index('ix_appointment_client_id_status', 'client_id', 'status'),
     )
 
 
@@ -569,6 +629,11 @@ class AuctionInfo(Activity):
     )
     initial_bid: Mapped[coin] = mapped_column(server_default=text("20"))
     min_increment: Mapped[coin] = mapped_column(server_default=text("10"))
+    # Highest bid in `bidInfo`, maintained by `bidding_auction`
+    current_high_bid: Mapped[Decimal | None] = mapped_column(
+        Numeric(precision=15, scale=2)
+    )
+    current_high_bidder: Mapped[userFK]
 
     # seer: Mapped[Seer] = relationship(back_populates="auctions")
     bid_info: Mapped[list["BidInfo"]] = relationship(
@@ -580,6 +645,28 @@ class AuctionInfo(Activity):
         "polymorphic_identity": "auctionInfo"
     }
 
+    __table_args__ = (
+        # Busy time ranges of seer
+        Index(
+            'ix_auctionInfo_seer_id_appoint_start_time',
+            'seer_id', 'appoint_start_time', 'appoint_end_time'
+        ),
+        # Ongoing auctions, conclusion scheduler, keyset pagination
+        Index('ix_auctionInfo_end_time_id', 'end_time', 'id'),
+        Index('ix_auctionInfo_start_time_id', 'start_time', 'id'),
+        Index(
+            'ix_auctionInfo_appoint_start_time_id',
+            'appoint_start_time', 'id'
+        ),
+        # name ILIKE '...%'
+        Index(
+            'ix_auctionInfo_name_trgm',
+            'name',
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'}
+        ),
+    )
+
 
 class BidInfo(Base):
     __tablename__ = "bidInfo"
@@ -594,6 +681,40 @@ class BidInfo(Base):
     # user: Mapped[User] = relationship(back_populates="bids")
 
 
+Index(
+    'ix_bidInfo_auction_id_amount',
+    BidInfo.auction_id,
+    BidInfo.amount.desc()
+)
+
+
+class SeerBusy(Base):
+    '''
+    Time committed by seer, one row per pending or completed appointment
+    and per auction appointment window. Maintained by triggers on
+    `appointment` and `auctionInfo`, the exclusion constraint rejects
+    overlapping rows of the same seer.
+    '''
+    __tablename__ = "seerBusy"
+
+    activity_id: Mapped[intPK] = mapped_column(
+        ForeignKey(Activity.id, ondelete="CASCADE")
+    )
+    seer_id: Mapped[int] = mapped_column(
+        ForeignKey(Seer.id, ondelete="CASCADE")
+    )
+    span: Mapped[Range[dt.datetime]] = mapped_column(TSTZRANGE)
+
+    __table_args__ = (
+        ExcludeConstraint(
+            ('seer_id', '='),
+            ('span', '&&'),
+            name='seerBusy_no_overlap',
+            using='gist'
+        ),
+    )
+
+
 '''
  ███████████                       
  █   ███   █                       
@@ -648,6 +769,12 @@ class Transaction(Base):
             'ix_transaction_user_id_activity_id',
             'user_id', 'activity_id'
         ),
+        # Held coins of activity, e.g. bids of unconcluded auctions
+        Index(
+            'ix_transaction_activity_id_hold',
+            'activity_id',
+            postgresql_where=text("status = 'hold'")
+        ),
     )
 
 
@@ -669,6 +796,12 @@ class Review(Base):
         passive_deletes=True
     )
 
+    __table_args__ = (
+        # Keyset pagination
+        Index('ix_review_score_id', 'score', 'id'),
+        Index('ix_review_date_created_id', 'date_created', 'id'),
+    )
+
 
 class Report(Base):
     __tablename__ = "report"
@@ -684,6 +817,21 @@ class Report(Base):
     # reporter: Mapped[User] = relationship(back_populates="reports")
     review: Mapped[Review | None] = relationship(back_populates="report")
 
+    __table_args__ = (
+        # Keyset pagination
+        Index('ix_report_review_id_id', 'review_id', 'id'),
+        Index('ix_report_date_created_id', 'date_created', 'id'),
+    )
+
+
+# Keyset pagination by reporter, a deleted reporter (NULL) sorts as 0
+# since rows can not be compared with NULL
+Index(
+    'ix_report_user_id_id',
+    func.coalesce(Report.user_id, 0),
+    Report.id
+)
+
 
 class NotificationHistory(Base):
     __tablename__ = "notificationHistory"
@@ -705,6 +853,40 @@ class NotificationHistory(Base):
     transaction: Mapped[Transaction | None] = relationship()
 
 
+class OutboxStatus(str, pyEnum):
+    pending = "pending"
+    failed = "failed"
+
+
+class TriggerOutbox(Base):
+    '''
+    Requests to trigger service, written in the same transaction
+    as the change that needs them and delivered by `app.trigger.outbox`.
+    Delivered rows are deleted.
+    '''
+    __tablename__ = "triggerOutbox"
+
+    id: Mapped[intPK] = mapped_column(BigInteger, Identity())
+    path: Mapped[strText]
+    payload: Mapped[dict[str, Any]] = mapped_column(JSONB)
+    status: Mapped[OutboxStatus] = mapped_column(
+        server_default=text("'pending'")
+    )
+    attempts: Mapped[int] = mapped_column(server_default=text("0"))
+    next_attempt_at: Mapped[timestamp] = mapped_column(
+        server_default=func.now()
+    )
+    date_created: Mapped[timestamp] = mapped_column(server_default=func.now())
+
+    __table_args__ = (
+        Index(
+            'ix_triggerOutbox_next_attempt_at',
+            'next_attempt_at',
+            postgresql_where=text("status = 'pending'")
+        ),
+    )
+
+
 counter_tables = DDL('''\
 CREATE TABLE IF NOT EXISTS "scheduleCounter" (
     id INTEGER PRIMARY KEY,
@@ -731,46 +913,110 @@ CREATE TABLE IF NOT EXISTS "notificationCounter" (
 );
 ''').execute_if(dialect='postgresql')
 
-funcs = DDL("""\
-CREATE OR REPLACE FUNCTION increment_composite() RETURNS TRIGGER AS $$
+extensions = DDL("""\
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+""").execute_if(dialect='postgresql')
+
+ID_COUNTERS = {
+    Schedule.__tablename__: ("scheduleCounter", "seer_id"),
+    FortunePackage.__tablename__: ("fPackageCounter", "seer_id"),
+    QuestionPackage.__tablename__: ("qPackageCounter", "seer_id"),
+    NotificationHistory.__tablename__: ("notificationCounter", "user_id"),
+}
+'''Table with composite id: (counter table, owner column)'''
+
+
+def composite_id_function(table: str, counter: str, owner: str) -> str:
+    '''
+    Static trigger function for `table`, so the plan is cached instead of
+    building dynamic SQL per row. An explicit id only raises the counter
+    when it is ahead of it.
+    '''
+    return f"""\
+CREATE OR REPLACE FUNCTION "{table}_id"() RETURNS TRIGGER AS $$
 BEGIN
     IF NEW.id IS NOT NULL THEN
-		EXECUTE format(
-	        'UPDATE %%I SET counter=$1.id
-			WHERE %%I.id = $1.%%I AND counter < $1.id',
-			TG_ARGV[0], TG_ARGV[0], TG_ARGV[1]
-	    )
-		USING NEW;
-	    RETURN NEW;
-	END IF;
-
-    EXECUTE format(
-        'INSERT INTO %%I (id, counter) values ($1.%%I, 1)
-        ON CONFLICT (id) DO UPDATE SET counter=%%I.counter+1
-        returning counter', TG_ARGV[0], TG_ARGV[1], TG_ARGV[0]
-    )
-	INTO NEW.id
-	USING NEW;
+        UPDATE "{counter}" SET counter = NEW.id
+        WHERE id = NEW.{owner} AND counter < NEW.id;
+        RETURN NEW;
+    END IF;
+    INSERT INTO "{counter}" (id, counter) VALUES (NEW.{owner}, 1)
+    ON CONFLICT (id) DO UPDATE SET counter = "{counter}".counter + 1
+    RETURNING counter INTO NEW.id;
     RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
-""").execute_if(dialect='postgresql')
+"""
 
-triggers = DDL("""\
-CREATE OR REPLACE TRIGGER pk_increment BEFORE INSERT ON "seerSchedule"
-FOR EACH ROW EXECUTE PROCEDURE increment_composite('scheduleCounter', 'seer_id');
 
-CREATE OR REPLACE TRIGGER pk_increment BEFORE INSERT ON "fortunePackage"
-FOR EACH ROW EXECUTE PROCEDURE increment_composite('fPackageCounter', 'seer_id');
+funcs = DDL("".join(
+    composite_id_function(table, counter, owner)
+    for table, (counter, owner) in ID_COUNTERS.items()
+) + """
+CREATE OR REPLACE FUNCTION appointment_busy() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' OR NEW.seer_id IS NULL
+        OR NEW.status IN ('u_cancelled', 's_cancelled') THEN
+        IF TG_OP <> 'INSERT' THEN
+            DELETE FROM "seerBusy" WHERE activity_id = OLD.id;
+        END IF;
+        RETURN NULL;
+    END IF;
+    INSERT INTO "seerBusy" (activity_id, seer_id, span)
+    VALUES (NEW.id, NEW.seer_id, tstzrange(NEW.start_time, NEW.end_time))
+    ON CONFLICT (activity_id) DO UPDATE
+    SET seer_id = EXCLUDED.seer_id, span = EXCLUDED.span;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
 
-CREATE OR REPLACE TRIGGER pk_increment BEFORE INSERT ON "questionPackage"
-FOR EACH ROW EXECUTE PROCEDURE increment_composite('qPackageCounter', 'seer_id');
+CREATE OR REPLACE FUNCTION auction_busy() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM "seerBusy" WHERE activity_id = OLD.id;
+        RETURN NULL;
+    END IF;
+    INSERT INTO "seerBusy" (activity_id, seer_id, span)
+    VALUES (
+        NEW.id, NEW.seer_id,
+        tstzrange(NEW.appoint_start_time, NEW.appoint_end_time)
+    )
+    ON CONFLICT (activity_id) DO UPDATE
+    SET seer_id = EXCLUDED.seer_id, span = EXCLUDED.span;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+""").execute_if(dialect='postgresql')
 
-CREATE OR REPLACE TRIGGER pk_increment BEFORE INSERT ON "notificationHistory"
-FOR EACH ROW EXECUTE PROCEDURE increment_composite('notificationCounter', 'user_id');
+triggers = DDL("".join(
+    f"""\
+CREATE OR REPLACE TRIGGER pk_increment BEFORE INSERT ON "{table}"
+FOR EACH ROW EXECUTE PROCEDURE "{table}_id"();
+
+"""
+    for table in ID_COUNTERS
+) + """\
+DROP FUNCTION IF EXISTS increment_composite();
+
+CREATE OR REPLACE TRIGGER busy_sync
+AFTER INSERT OR UPDATE OF seer_id, start_time, end_time, status OR DELETE
+ON "appointment"
+FOR EACH ROW EXECUTE PROCEDURE appointment_busy();
+
+CREATE OR REPLACE TRIGGER busy_sync
+AFTER INSERT OR UPDATE OF seer_id, appoint_start_time, appoint_end_time
+OR DELETE ON "auctionInfo"
+FOR EACH ROW EXECUTE PROCEDURE auction_busy();
 """).execute_if(dialect='postgresql')
 
 
+@event.listens_for(Base.metadata, 'before_create')
+def receive_before_create(target, connection: Connection, **kw):
+    if kw.get('tables', None):
+        connection.execute(extensions)
+
+
 @event.listens_for(Base.metadata, 'after_create')
 def receive_after_create(target, connection: Connection, **kw):
     if kw.get('tables', None):
@@ -21,3 +21,4 @@ def parse_not_null_violation(error: NotNullViolation) -> dict:
     Parse a NotNullViolation error from psycopg into a dictionary.
     '''
     return {"field": error.diag.column_name, "type": "NotNullViolation"}
+
@@ -5,7 +5,15 @@ from fastapi.responses import FileResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.error import exc_handlers
+from app.core.pagination import CURSOR_HEADER
 from app.components import get_api_router, tags_metadata
+from app.database.listener import pg_listener
+from app.trigger.service import open_client, close_client
+from app.trigger.outbox import outbox_dispatcher
+from app.components.images.service import (
+    start_image_executor,
+    shutdown_image_executor,
+)
 from app import (
     database,
     objectStorage
@@ -16,8 +24,20 @@ from app import (
 async def lifespan(app: FastAPI):
     # startup
     # await database.create_tables()
+    # Imported after routers, auction package can not be imported first
+    from app.components.auction.scheduler import auction_scheduler
+    await open_client()
+    await start_image_executor()
+    await pg_listener.start()
+    await outbox_dispatcher.start()
+    await auction_scheduler.start()
     yield
     # shutdown
+    await auction_scheduler.stop()
+    await outbox_dispatcher.stop()
+    await pg_listener.stop()
+    await close_client()
+    shutdown_image_executor()
 
 
 origins = [
@@ -42,7 +62,8 @@ app.add_middleware(
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=[CURSOR_HEADER]
 )
 app.include_router(get_api_router())
 
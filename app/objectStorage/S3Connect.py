@@ -1,4 +1,10 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO
+
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.client import Config
 from app.core.config import settings
 import os
@@ -7,7 +13,13 @@ AccountID = settings.secret_dp_S3_ACCOUNT_ID
 Bucket = settings.main_BUCKET_NAME
 ClientAccessKey = settings.secret_dp_S3_ACCESS_KEY
 ClientSecret = settings.secret_dp_S3_SECRET
-ConnectionUrl = f"https://{AccountID}.r2.cloudflarestorage.com"
+ConnectionUrl = (
+    settings.S3_ENDPOINT_URL
+    or f"https://{AccountID}.r2.cloudflarestorage.com"
+)
+# Parts of one upload sent at once
+PART_CONCURRENCY = 4
+MB = 1024 * 1024
 
 
 # Create a client to connect to Cloudflare's R2 Storage
@@ -16,12 +28,49 @@ S3Connect = boto3.client(
     endpoint_url=ConnectionUrl,
     aws_access_key_id=ClientAccessKey,
     aws_secret_access_key=ClientSecret,
-    config=Config(signature_version='s3v4'),
+    config=Config(
+        signature_version='s3v4',
+        max_pool_connections=settings.S3_CONCURRENCY * PART_CONCURRENCY
+    ),
     region_name='auto'
 
 )
+# Files above the threshold are sent as multipart, read from the
+# file object one part at a time
+Transfer = TransferConfig(
+    multipart_threshold=settings.S3_MULTIPART_THRESHOLD_MB * MB,
+    multipart_chunksize=settings.S3_MULTIPART_THRESHOLD_MB * MB,
+    max_concurrency=PART_CONCURRENCY,
+)
+# boto3 is blocking, calls run here so the event loop keeps serving.
+# Extra calls queue instead of adding threads.
+S3Executor = ThreadPoolExecutor(
+    max_workers=settings.S3_CONCURRENCY,
+    thread_name_prefix="s3"
+)
+
+
 def get_s3_connect():
     return S3Connect
 
 def get_s3_main_Bucket():
-    return Bucket
\ No newline at end of file
+    return Bucket
+
+
+async def run_s3(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        S3Executor, functools.partial(fn, *args, **kwargs)
+    )
+
+
+async def upload_object(key: str, fileobj: BinaryIO, content_type: str | None = None):
+    extra_args = {'ContentType': content_type} if content_type else None
+    await run_s3(
+        S3Connect.upload_fileobj, fileobj, Bucket, key,
+        ExtraArgs=extra_args, Config=Transfer
+    )
+
+
+async def delete_object(key: str):
+    await run_s3(S3Connect.delete_object, Bucket=Bucket, Key=key)
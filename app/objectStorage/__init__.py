@@ -1 +1,6 @@
-from .S3Connect import get_s3_connect , get_s3_main_Bucket
\ No newline at end of file
+from .S3Connect import (
+    get_s3_connect,
+    get_s3_main_Bucket,
+    upload_object,
+    delete_object,
+)
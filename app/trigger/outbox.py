@@ -0,0 +1,197 @@
+import asyncio
+import datetime as dt
+import logging
+
+from sqlalchemy import delete, event, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database.connection import async_session
+from app.database.models import OutboxStatus, TriggerOutbox
+from .service import (
+    AUCTION_TRIGGER_PATH,
+    CHANGE_PASSWORD_PATH,
+    VERIFY_EMAIL_PATH,
+    VERIFY_SEER_EMAIL_PATH,
+    post,
+)
+
+logger = logging.getLogger('uvicorn.error')
+
+
+async def enqueue(session: AsyncSession, path: str, payload: dict):
+    '''
+    Add request to trigger service outbox. No commit here,
+    the request is sent only after the caller commits.
+    '''
+    await session.execute(
+        insert(TriggerOutbox).values(path=path, payload=payload)
+    )
+    session.info['outbox'] = True
+
+
+async def queue_verify_email(session: AsyncSession, email, verify_url):
+    await enqueue(session, VERIFY_EMAIL_PATH, {
+        'url': verify_url,
+        'email': email
+    })
+
+
+async def queue_verify_seer_email(session: AsyncSession, email, verify_url):
+    await enqueue(session, VERIFY_SEER_EMAIL_PATH, {
+        'url': verify_url,
+        'email': email
+    })
+
+
+async def queue_change_password(session: AsyncSession, email, verify_url):
+    await enqueue(session, CHANGE_PASSWORD_PATH, {
+        'url': verify_url,
+        'email': email
+    })
+
+
+async def queue_trigger_auction(
+    session: AsyncSession,
+    auction_id: int,
+    time_date: dt.datetime,
+    trigger_url_part: str,
+    security_key: str
+):
+    await enqueue(session, AUCTION_TRIGGER_PATH, {
+        'auction_ID': auction_id,
+        'time_date': time_date.isoformat(),
+        'trigger_url_part': trigger_url_part,
+        'security_key': security_key,
+    })
+
+
+class OutboxDispatcher:
+    '''
+    Deliver outbox rows to trigger service in batches.
+
+    Rows are claimed with `FOR UPDATE SKIP LOCKED` and leased for
+    `TRIGGER_OUTBOX_LEASE` seconds, so every worker can run a dispatcher
+    and a row abandoned by a crashed worker is picked up again.
+    Failed deliveries are retried with exponential backoff until
+    `TRIGGER_OUTBOX_MAX_ATTEMPTS`, then kept with status `failed`.
+    '''
+
+    def __init__(self):
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def wake(self):
+        self._wake.set()
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                count = await self.dispatch()
+            except Exception:
+                logger.exception("Outbox dispatch failed")
+                count = 0
+            if count >= settings.TRIGGER_OUTBOX_BATCH:
+                continue
+            try:
+                await asyncio.wait_for(
+                    self._wake.wait(),
+                    settings.TRIGGER_OUTBOX_POLL_INTERVAL
+                )
+            except TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def dispatch(self) -> int:
+        '''
+        Deliver one batch, return number of claimed rows.
+        '''
+        claimable = (
+            select(TriggerOutbox.id).
+            where(
+                TriggerOutbox.status == OutboxStatus.pending,
+                TriggerOutbox.next_attempt_at <= func.now()
+            ).
+            order_by(TriggerOutbox.id).
+            limit(settings.TRIGGER_OUTBOX_BATCH).
+            with_for_update(skip_locked=True)
+        )
+        lease = dt.timedelta(seconds=settings.TRIGGER_OUTBOX_LEASE)
+        stmt = (
+            update(TriggerOutbox).
+            where(TriggerOutbox.id.in_(claimable.scalar_subquery())).
+            values(
+                attempts=TriggerOutbox.attempts + 1,
+                next_attempt_at=func.now() + lease
+            ).
+            returning(
+                TriggerOutbox.id,
+                TriggerOutbox.path,
+                TriggerOutbox.payload,
+                TriggerOutbox.attempts
+            )
+        )
+        async with async_session() as session:
+            rows = (await session.execute(stmt)).all()
+            await session.commit()
+        if not rows:
+            return 0
+
+        results = await asyncio.gather(
+            *(post(row.path, row.payload) for row in rows)
+        )
+
+        async with async_session() as session:
+            sent = [row.id for row, ok in zip(rows, results) if ok]
+            if sent:
+                await session.execute(
+                    delete(TriggerOutbox).where(TriggerOutbox.id.in_(sent))
+                )
+            for row, ok in zip(rows, results):
+                if ok:
+                    continue
+                logger.warning(
+                    f"Trigger outbox delivery failed "
+                    f"(id = {row.id}, path = {row.path}, attempts = {row.attempts})"
+                )
+                await session.execute(
+                    update(TriggerOutbox).
+                    where(TriggerOutbox.id == row.id).
+                    values(**retry_values(row.attempts))
+                )
+            await session.commit()
+        return len(rows)
+
+
+def retry_values(attempts: int) -> dict:
+    if attempts >= settings.TRIGGER_OUTBOX_MAX_ATTEMPTS:
+        return {"status": OutboxStatus.failed}
+    backoff = min(
+        settings.TRIGGER_OUTBOX_BACKOFF * 2 ** (attempts - 1),
+        settings.TRIGGER_OUTBOX_MAX_BACKOFF
+    )
+    return {"next_attempt_at": func.now() + dt.timedelta(seconds=backoff)}
+
+
+outbox_dispatcher = OutboxDispatcher()
+
+
+@event.listens_for(Session, "after_commit")
+def wake_dispatcher(session: Session):
+    if session.info.pop('outbox', False):
+        outbox_dispatcher.wake()
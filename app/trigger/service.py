@@ -17,6 +17,69 @@ headers = {
     "Content-Type": "application/json",
 }
 
+VERIFY_EMAIL_PATH = "/api/email/send_verify_email"
+VERIFY_SEER_EMAIL_PATH = "/api/email/send_verify_seer_email"
+CHANGE_PASSWORD_PATH = "/api/email/send_change_password_email"
+APPOINTMENT_EMAIL_PATH = "/api/email/send_appointment_email"
+AUCTION_TRIGGER_PATH = "/api/trigger/auction"
+
+client: httpx.AsyncClient | None = None
+
+
+def new_client():
+    '''
+    Client with keep-alive connection pool and shared retry
+    and timeout policy for every request to trigger service.
+    '''
+    transport = httpx.AsyncHTTPTransport(
+        http2=settings.TRIGGER_HTTP2,
+        limits=httpx.Limits(
+            max_connections=settings.TRIGGER_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.TRIGGER_MAX_CONNECTIONS,
+            keepalive_expiry=settings.TRIGGER_KEEPALIVE_EXPIRY,
+        ),
+        retries=settings.TRIGGER_RETRIES,
+    )
+    return httpx.AsyncClient(
+        base_url=protocal + Trigger_URL,
+        headers=headers,
+        timeout=httpx.Timeout(
+            settings.TRIGGER_TIMEOUT,
+            connect=settings.TRIGGER_CONNECT_TIMEOUT
+        ),
+        transport=transport,
+    )
+
+
+async def open_client():
+    '''Called at startup in `lifespan`.'''
+    global client
+    if client is None:
+        client = new_client()
+
+
+async def close_client():
+    '''Called at shutdown in `lifespan`.'''
+    global client
+    if client is not None:
+        await client.aclose()
+        client = None
+
+
+def get_client():
+    global client
+    if client is None:
+        client = new_client()
+    return client
+
+
+async def post(path: str, body: dict) -> bool:
+    try:
+        response = await get_client().post(path, json=body)
+        return response.is_success
+    except httpx.TransportError:
+        return False
+
 
 async def send_generic_email():
     pass
@@ -27,18 +90,8 @@ async def send_verify_email(email, verify_url):
         'url': verify_url,
         'email': email
     }
-    path = "/api/email/send_verify_email"
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                protocal + Trigger_URL + path,
-                json=myobj,
-                headers=headers,
-                timeout=30
-            )
-            success = response.is_success
-        except httpx.TimeoutException:
-            success = False
+    path = VERIFY_EMAIL_PATH
+    success = await post(path, myobj)
     if not success:
         logger.warning(f"Failed to send email to {email}")
         logger.warning(f"Url: {verify_url}")
@@ -50,18 +103,8 @@ async def send_verify_seer_email(email, verify_url):
         'url': verify_url,
         'email': email
     }
-    path = "/api/email/send_verify_seer_email"
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                protocal + Trigger_URL + path,
-                json=myobj,
-                headers=headers,
-                timeout=30
-            )
-            success = response.is_success
-        except httpx.TimeoutException:
-            success = False
+    path = VERIFY_SEER_EMAIL_PATH
+    success = await post(path, myobj)
     if not success:
         logger.warning(f"Failed to send email to {email}")
         logger.warning(f"Url: {verify_url}")
@@ -73,18 +116,8 @@ async def send_change_password(email, verify_url):
         'url': verify_url,
         'email': email
     }
-    path = "/api/email/send_change_password_email"
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                protocal + Trigger_URL + path,
-                json=myobj,
-                headers=headers,
-                timeout=30
-            )
-            success = response.is_success
-        except httpx.TimeoutException:
-            success = False
+    path = CHANGE_PASSWORD_PATH
+    success = await post(path, myobj)
     if not success:
         logger.warning(f"Failed to send email to {email}")
         logger.warning(f"Url: {verify_url}")
@@ -94,20 +127,10 @@ async def send_change_password(email, verify_url):
 async def send_appointment_email(appointment_ID: int, time_date: datetime):
     myobj = {
         'appointment_ID': appointment_ID,
-        'time_date': time_date
+        'time_date': time_date.isoformat()
     }
-    path = "/api/email/send_appointment_email"
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                protocal + Trigger_URL + path,
-                json=myobj,
-                headers=headers,
-                timeout=30
-            )
-            success = response.is_success
-        except httpx.TimeoutException:
-            success = False
+    path = APPOINTMENT_EMAIL_PATH
+    success = await post(path, myobj)
     if not success:
         logger.warning(
             f"Failed to send email (appointment_ID = {appointment_ID} )")
@@ -121,18 +144,8 @@ async def trigger_auction(auction_id: int, time_date: datetime, trigger_url_part
         'trigger_url_part': trigger_url_part,
         'security_key': security_key,
     }
-    path = "/api/trigger/auction"
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                protocal + Trigger_URL + path,
-                json=myobj,
-                headers=headers,
-                timeout=30
-            )
-            success = response.is_success
-        except httpx.TimeoutException:
-            success = False
+    path = AUCTION_TRIGGER_PATH
+    success = await post(path, myobj)
     if not success:
         logger.warning(
             f"Failed to send trigger request (auction_id = {auction_id} )")
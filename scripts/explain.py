@@ -0,0 +1,179 @@
+'''
+Print query plans of the statements behind the hot endpoints.
+
+Run against a seeded local database (settings are read from `.env`):
+
+    python -m scripts.explain [--analyze] [--only NAME]
+
+Each case calls the service function as the endpoint does, captures the
+SQL it sends, then runs `EXPLAIN` on every captured statement with the same
+parameters. Everything runs in a transaction that is rolled back.
+'''
+import argparse
+import asyncio
+from datetime import date, datetime, time, timedelta, timezone
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Components import each other, load them in the order the app does
+import app.main  # noqa: F401
+from app.components.appointment.service import (
+    get_appointments,
+    get_cancelled_count,
+)
+from app.components.appointment.time_slots import (
+    get_free_time_slots,
+    is_slot_available,
+)
+from app.components.auction.service import (
+    get_auction_bidder,
+    get_auctions,
+    get_highest_bidder,
+)
+from app.components.review.service import get_reviews
+from app.components.seer.package.fortune.service import search_fpackage_cards
+from app.components.seer.service import (
+    get_seer_followers,
+    get_seer_total_followers,
+    searching_seers,
+)
+from app.components.withdraw.service import get_withdrawals_List
+from app.database.connection import engine
+from app.database.models import (
+    Appointment,
+    AuctionInfo,
+    FPStatus,
+    FortunePackage,
+    User,
+    Withdrawal,
+)
+
+
+async def sample_ids(session: AsyncSession) -> dict:
+    '''
+    Pick existing rows so that cases hit real data.
+    '''
+    package = (await session.execute(
+        select(FortunePackage.seer_id, FortunePackage.id).
+        where(FortunePackage.status == FPStatus.published).
+        limit(1)
+    )).one_or_none()
+    return {
+        'seer_id': package.seer_id if package else 1,
+        'package_id': package.id if package else 1,
+        'user_id': (await session.scalar(
+            select(Appointment.client_id).limit(1)
+        )) or 1,
+        'auction_id': (await session.scalar(
+            select(AuctionInfo.id).limit(1)
+        )) or 1,
+        'display_name': (await session.scalar(
+            select(func.left(User.display_name, 2)).limit(1)
+        )) or 'a',
+        'requester_id': (await session.scalar(
+            select(Withdrawal.requester_id).limit(1)
+        )) or 1,
+    }
+
+
+def cases(ids: dict):
+    today = date.today()
+    return {
+        'search_seers': lambda s: searching_seers(
+            s, display_name=ids['display_name']
+        ),
+        'search_fortune_packages': lambda s: search_fpackage_cards(
+            s, name=ids['display_name'], status=FPStatus.published
+        ),
+        'search_auctions': lambda s: get_auctions(
+            s, seer_display_name=ids['display_name']
+        ),
+        'seer_auctions': lambda s: get_auctions(s, seer_id=ids['seer_id']),
+        'auction_bids': lambda s: get_auction_bidder(s, ids['auction_id']),
+        'auction_highest_bid': lambda s: get_highest_bidder(
+            s, ids['auction_id']
+        ),
+        'time_slots': lambda s: get_free_time_slots(
+            s, ids['seer_id'], ids['package_id'],
+            today, today + timedelta(days=30)
+        ),
+        'booking_check': lambda s: is_slot_available_at_noon(s, ids),
+        'client_appointments': lambda s: get_appointments(
+            s, client_id=ids['user_id']
+        ),
+        'seer_appointments': lambda s: get_appointments(
+            s, seer_id=ids['seer_id']
+        ),
+        'cancel_quota': lambda s: get_cancelled_count(s, ids['user_id']),
+        'seer_reviews': lambda s: get_reviews(s, seer_id=ids['seer_id']),
+        'seer_followers': lambda s: get_seer_followers(
+            s, ids['seer_id'], 0, 10
+        ),
+        'seer_total_followers': lambda s: get_seer_total_followers(
+            s, ids['seer_id']
+        ),
+        'seer_withdrawals': lambda s: get_withdrawals_List(
+            s, requester_id=ids['requester_id']
+        ),
+    }
+
+
+async def is_slot_available_at_noon(session: AsyncSession, ids: dict):
+    bkk = timezone(timedelta(hours=7))
+    start = datetime.combine(
+        date.today() + timedelta(days=1), time(12), tzinfo=bkk
+    )
+    return await is_slot_available(
+        session, ids['seer_id'], start, start + timedelta(hours=1)
+    )
+
+
+async def explain(name: str, case, analyze: bool):
+    captured: list[tuple[str, object]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith('EXPLAIN'):
+            captured.append((statement, parameters))
+
+    async with engine.connect() as conn:
+        event.listen(conn.sync_connection, 'before_cursor_execute', capture)
+        session = AsyncSession(bind=conn)
+        try:
+            await case(session)
+        except Exception as e:
+            print(f"== {name}: {e!r}")
+        event.remove(conn.sync_connection, 'before_cursor_execute', capture)
+
+        options = "ANALYZE, BUFFERS" if analyze else "COSTS"
+        for i, (statement, parameters) in enumerate(captured, 1):
+            print(f"== {name} [{i}/{len(captured)}]")
+            print(statement)
+            result = await conn.exec_driver_sql(
+                f"EXPLAIN ({options}) {statement}", parameters
+            )
+            for (line,) in result:
+                print(f"    {line}")
+            print()
+        await conn.rollback()
+
+
+async def main(analyze: bool, only: str | None):
+    async with AsyncSession(engine) as session:
+        ids = await sample_ids(session)
+    print(f"Sample ids: {ids}\n")
+    for name, case in cases(ids).items():
+        if only is None or name == only:
+            await explain(name, case, analyze)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--analyze', action='store_true',
+        help="run EXPLAIN ANALYZE, statements are executed"
+    )
+    parser.add_argument('--only', help="run a single case by name")
+    args = parser.parse_args()
+    asyncio.run(main(args.analyze, args.only))
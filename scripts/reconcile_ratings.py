@@ -0,0 +1,32 @@
+'''
+Verify stored seer ratings against reviews and fix drifted ones.
+Meant to run nightly, e.g. from cron (settings are read from `.env`):
+
+    python -m scripts.reconcile_ratings [--seer-id ID]
+'''
+import argparse
+import asyncio
+import logging
+
+# Components import each other, load them in the order the app does
+import app.main  # noqa: F401
+from app.components.review.service import reconcile_seer_ratings
+from app.database.connection import async_session, engine
+
+logger = logging.getLogger('uvicorn.error')
+
+
+async def main(seer_id: int | None):
+    async with async_session() as session:
+        fixed = await reconcile_seer_ratings(session, seer_id)
+    if fixed:
+        logger.warning(f"Fixed rating of {len(fixed)} seers: {fixed}")
+    print(f"Fixed {len(fixed)} seers")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seer-id', type=int, help="check a single seer")
+    args = parser.parse_args()
+    asyncio.run(main(args.seer_id))